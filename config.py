@@ -1,9 +1,7 @@
 import os
-from typing import List
-try:
-    from pydantic_settings import BaseSettings
-except ImportError:
-    from pydantic import BaseSettings
+from functools import lru_cache
+from typing import List, Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
@@ -11,7 +9,28 @@ class Settings(BaseSettings):
     
     # OpenAI Configuration
     openai_api_key: str
-    openai_model: str = "gpt-4"
+    openai_model: str = "gpt-4o-mini"  # Must support JSON mode
+    openai_max_connections: int = 200
+    openai_max_keepalive_connections: int = 100
+    openai_timeout: float = 30.0
+    openai_connect_timeout: float = 5.0
+    
+    # Classification Cache Configuration
+    classification_cache_enabled: bool = True
+    classification_cache_size: int = 1024
+    classification_cache_path: Optional[str] = None  # SQLite file for persistence across restarts
+    
+    # Low-confidence classifications are re-run on this model (None disables)
+    classification_review_model: Optional[str] = "gpt-4o"
+    classification_review_threshold: float = 0.6
+    
+    # Generated responses reused for identical prompts (0 disables)
+    response_cache_size: int = 512
+    generation_max_concurrency: int = 20  # Concurrent response-generation calls to OpenAI
+    
+    # Classification Batching Configuration
+    classification_batch_size: int = 1  # >1 combines concurrent requests into one prompt (1 disables batching)
+    classification_batch_window_ms: int = 20
     
     # Application Configuration
     app_name: str = "Intelligent Help Desk System"
@@ -24,7 +43,18 @@ class Settings(BaseSettings):
     
     # Vector Search Configuration
     embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_bf16: bool = False  # BF16 encoder inference (requires intel-extension-for-pytorch)
     similarity_threshold: float = 0.7
+    embedding_cache_dir: Optional[str] = ".cache/embeddings"  # None disables the on-disk cache
+    ann_min_chunks: int = 10000  # Build a FAISS (or hnswlib) index, if installed, from this many chunks
+    quantize_embeddings: bool = False  # Search int8-quantized vectors (FAISS or brute force)
+    embedding_pca_dims: int = 0  # Project embeddings onto this many principal components (0 disables)
+    query_embedding_cache_size: int = 2048  # Recent query embeddings kept in memory
+    query_batch_size: int = 32  # Concurrent queries encoded together (1 disables batching)
+    query_batch_window_ms: int = 5  # Only waited when other queries are already queued
+    retrieval_cache_size: int = 0  # Recent queries per category whose results are reused (0 disables)
+    retrieval_cache_threshold: float = 0.95  # Cosine similarity at which a query counts as a repeat
+    precomputed_retrieval_categories: List[str] = []  # Short queries in these categories skip the vector search
     
     # Data Paths
     data_dir: str = "data"
@@ -34,15 +64,13 @@ class Settings(BaseSettings):
     def auto_escalate_categories(self) -> List[str]:
         return ["security_incident", "hardware_failure"]
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
-
-
-# Global settings instance
-settings = Settings()
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False
+    )
 
 
+@lru_cache()
 def get_settings() -> Settings:
-    """Get application settings."""
-    return settings
\ No newline at end of file
+    """Get application settings, parsed from the environment once and then reused."""
+    return Settings()
\ No newline at end of file
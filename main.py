@@ -1,14 +1,21 @@
+import asyncio
+import logging
+import random
+import sys
 import time
 import uuid
 from contextlib import asynccontextmanager
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
+import httpx
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from openai import AsyncOpenAI
 
 from config import get_settings, Settings
 from models import UserRequest, HelpDeskRequest, HelpDeskResponse
+from models.response import ClassificationResult, KnowledgeItem, EscalationInfo
 from utils import DocumentLoader, KnowledgeBase
 from services.classifier import RequestClassifier
 from services.retriever import KnowledgeRetriever
@@ -16,53 +23,116 @@ from services.generator import ResponseGenerator
 from services.escalator import EscalationManager
 
 
+logger = logging.getLogger(__name__)
+
 # Global variables for shared resources
 knowledge_base: KnowledgeBase = None
+category_names: List[str] = []
 classifier: RequestClassifier = None
 retriever: KnowledgeRetriever = None
 generator: ResponseGenerator = None
 escalator: EscalationManager = None
+openai_client: AsyncOpenAI = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application startup and shutdown events."""
-    # Startup
-    print("🚀 Starting Intelligent Help Desk System...")
-    
-    global knowledge_base, classifier, retriever, generator, escalator
+    global knowledge_base, category_names, classifier, retriever, generator, escalator, openai_client
     settings = get_settings()
     
+    # Per-request progress is logged at INFO; production (debug off) only keeps warnings
+    logging.basicConfig(level=logging.INFO if settings.debug else logging.WARNING)
+    
+    # Startup
+    logger.info("🚀 Starting Intelligent Help Desk System...")
+    
     try:
-        # Load knowledge base
-        print("📚 Loading knowledge base...")
+        # Load knowledge base while the embedding model loads in parallel;
+        # the two touch independent resources
+        logger.info("📚 Loading knowledge base and embedding model...")
         loader = DocumentLoader(data_dir=settings.data_dir)
-        knowledge_base = loader.load_all()
+        knowledge_base, encoder = await asyncio.gather(
+            loader.load_all_async(),
+            asyncio.to_thread(KnowledgeRetriever.load_encoder, settings.embedding_model, settings.embedding_bf16)
+        )
+        # Categories are fixed after startup, so the name list is built once
+        category_names = [sys.intern(name) for name in knowledge_base.categories]
         
         # Initialize services
-        print("🤖 Initializing AI services...")
-        classifier = RequestClassifier(settings.openai_api_key, settings.openai_model)
+        logger.info("🤖 Initializing AI services...")
+        # One OpenAI client (and connection pool) shared by the classifier and generator
+        openai_client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.openai_max_connections,
+                    max_keepalive_connections=settings.openai_max_keepalive_connections
+                ),
+                timeout=httpx.Timeout(settings.openai_timeout, connect=settings.openai_connect_timeout)
+            )
+        )
+        classifier = RequestClassifier(
+            settings.openai_api_key,
+            settings.openai_model,
+            use_cache=settings.classification_cache_enabled,
+            cache_size=settings.classification_cache_size,
+            cache_path=settings.classification_cache_path,
+            batch_size=settings.classification_batch_size,
+            batch_window=settings.classification_batch_window_ms / 1000,
+            client=openai_client,
+            review_model=settings.classification_review_model,
+            review_threshold=settings.classification_review_threshold
+        )
         
-        print("🔍 Setting up knowledge retrieval...")
-        retriever = KnowledgeRetriever(knowledge_base, settings.embedding_model)
+        logger.info("🔍 Setting up knowledge retrieval...")
+        retriever = KnowledgeRetriever(
+            knowledge_base,
+            settings.embedding_model,
+            encoder=encoder,
+            cache_dir=settings.embedding_cache_dir,
+            ann_min_chunks=settings.ann_min_chunks,
+            concept_categories=settings.precomputed_retrieval_categories,
+            query_cache_size=settings.query_embedding_cache_size,
+            quantize_embeddings=settings.quantize_embeddings,
+            pca_dims=settings.embedding_pca_dims,
+            result_cache_size=settings.retrieval_cache_size,
+            result_cache_threshold=settings.retrieval_cache_threshold,
+            query_batch_size=settings.query_batch_size,
+            query_batch_window=settings.query_batch_window_ms / 1000,
+            use_bf16=settings.embedding_bf16
+        )
         await retriever.initialize()  # Build embeddings
         
-        print("✍️ Initializing response generator...")
-        generator = ResponseGenerator(settings.openai_api_key, settings.openai_model)
+        logger.info("✍️ Initializing response generator...")
+        generator = ResponseGenerator(
+            settings.openai_api_key,
+            settings.openai_model,
+            client=openai_client,
+            cache_size=settings.response_cache_size,
+            max_concurrency=settings.generation_max_concurrency
+        )
         
-        print("🚨 Setting up escalation manager...")
+        logger.info("🚨 Setting up escalation manager...")
         escalator = EscalationManager(knowledge_base)
         
-        print("✅ Help Desk System ready!")
+        logger.info("✅ Help Desk System ready!")
         
     except Exception as e:
-        print(f"❌ Failed to initialize system: {e}")
+        logger.exception("❌ Failed to initialize system: %s", e)
         raise
     
     yield
     
     # Shutdown
-    print("🛑 Shutting down Help Desk System...")
+    logger.info("🛑 Shutting down Help Desk System...")
+    if classifier:
+        await classifier.close()
+    if retriever:
+        await retriever.close()
+    if openai_client:
+        await openai_client.close()
+    await ResponseGenerator.close_shared_clients()
 
 
 # Create FastAPI app
@@ -70,6 +140,7 @@ app = FastAPI(
     title="Intelligent Help Desk System",
     description="AI-powered help desk system with request classification, knowledge retrieval, and automated responses",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -83,11 +154,6 @@ app.add_middleware(
 )
 
 
-# Dependency to get settings
-def get_app_settings() -> Settings:
-    return get_settings()
-
-
 @app.get("/")
 async def root():
     """Root endpoint with system information."""
@@ -125,7 +191,7 @@ async def health_check():
     all_healthy = all(status["components"].values())
     if not all_healthy:
         status["status"] = "unhealthy"
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=503,
             content=status
         )
@@ -155,62 +221,86 @@ async def get_categories():
     }
 
 
-@app.post("/request", response_model=HelpDeskResponse)
-async def submit_request(
-    user_request: UserRequest,
-    settings: Settings = Depends(get_app_settings)
-):
-    """Process a help desk request."""
-    global knowledge_base, classifier, retriever, generator, escalator
-    
-    # Check if all services are available
+def _ensure_services_ready():
+    """Raise 503 until every help desk service has been initialized."""
     if not all([knowledge_base, classifier, retriever, generator, escalator]):
         raise HTTPException(
             status_code=503, 
             detail="Help desk services not fully initialized"
         )
+
+
+async def _prepare_request(
+    user_request: UserRequest,
+    request_id: str
+) -> Tuple[HelpDeskRequest, ClassificationResult, List[KnowledgeItem], EscalationInfo]:
+    """Classify a request, then retrieve knowledge and check escalation for it."""
+    # Create internal request object
+    help_request = HelpDeskRequest(
+        id=request_id,
+        message=user_request.message,
+        user_id=user_request.user_id,
+        priority=user_request.priority
+    )
     
-    start_time = time.time()
-    request_id = str(uuid.uuid4())
+    # Step 1: Classify the request
+    logger.info("🔍 Classifying request %s", request_id)
+    classification_result = await classifier.classify_request(
+        help_request.message,
+        category_names
+    )
     
-    try:
-        # Create internal request object
-        help_request = HelpDeskRequest(
-            id=request_id,
-            message=user_request.message,
-            user_id=user_request.user_id,
-            priority=user_request.priority
-        )
-        
-        # Step 1: Classify the request
-        print(f"🔍 Classifying request {request_id}")
-        classification_result = await classifier.classify_request(
-            help_request.message,
-            list(knowledge_base.categories.keys())
-        )
-        
-        # Update request with classification
-        help_request.category = classification_result.category
-        help_request.confidence = classification_result.confidence
-        
-        # Step 2: Retrieve relevant knowledge
-        print(f"📖 Retrieving knowledge for {classification_result.category}")
-        knowledge_items = await retriever.retrieve_knowledge(
+    # Update request with classification
+    help_request.category = classification_result.category
+    help_request.confidence = classification_result.confidence
+    
+    # Steps 2 & 3: Retrieve relevant knowledge and check escalation requirements.
+    # Both depend only on the classification, so they run concurrently.
+    logger.info("📖 Retrieving knowledge for %s", classification_result.category)
+    logger.info("🚨 Checking escalation requirements")
+    knowledge_items, escalation_info = await asyncio.gather(
+        retriever.retrieve_knowledge(
             help_request.message,
             classification_result.category,
             top_k=3
-        )
-        
-        # Step 3: Check escalation requirements
-        print(f"🚨 Checking escalation requirements")
-        escalation_info = escalator.check_escalation(
+        ),
+        asyncio.to_thread(
+            escalator.check_escalation,
             classification_result.category,
             help_request.message,
             classification_result.confidence
         )
+    )
+    
+    return help_request, classification_result, knowledge_items, escalation_info
+
+
+def _new_request_id() -> str:
+    """Random version-4 UUID string for a new request."""
+    # The module-level PRNG avoids a urandom syscall per request and is reseeded in
+    # forked workers, so pre-forked processes do not repeat each other's ids
+    return str(uuid.UUID(int=random.getrandbits(128), version=4))
+
+
+@app.post("/request", response_model=HelpDeskResponse)
+async def submit_request(
+    user_request: UserRequest,
+    settings: Settings = Depends(get_settings)
+):
+    """Process a help desk request."""
+    _ensure_services_ready()
+    
+    start_time = time.time()
+    request_id = _new_request_id()
+    
+    try:
+        help_request, classification_result, knowledge_items, escalation_info = await _prepare_request(
+            user_request,
+            request_id
+        )
         
         # Step 4: Generate response
-        print(f"✍️ Generating response")
+        logger.info("✍️ Generating response")
         response_text = await generator.generate_response(
             help_request,
             classification_result,
@@ -232,21 +322,58 @@ async def submit_request(
             processing_time=processing_time
         )
         
-        print(f"✅ Request {request_id} processed in {processing_time:.2f}s")
+        logger.info("✅ Request %s processed in %.2fs", request_id, processing_time)
         return response
         
     except Exception as e:
-        print(f"❌ Error processing request {request_id}: {e}")
+        logger.exception("❌ Error processing request %s: %s", request_id, e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to process request: {str(e)}"
+        )
+
+
+@app.post("/request/stream")
+async def submit_request_stream(user_request: UserRequest):
+    """Process a help desk request and stream the response text as it is generated."""
+    _ensure_services_ready()
+    
+    request_id = _new_request_id()
+    
+    try:
+        help_request, classification_result, knowledge_items, escalation_info = await _prepare_request(
+            user_request,
+            request_id
+        )
+    except Exception as e:
+        logger.exception("❌ Error processing request %s: %s", request_id, e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process request: {str(e)}"
         )
+    
+    # Classification and escalation are known before generation starts, so send them as headers
+    logger.info("✍️ Streaming response for %s", request_id)
+    return StreamingResponse(
+        generator.stream_response(
+            help_request,
+            classification_result,
+            knowledge_items,
+            escalation_info
+        ),
+        media_type="text/plain; charset=utf-8",
+        headers={
+            "X-Request-ID": request_id,
+            "X-Category": classification_result.category,
+            "X-Escalation-Required": str(escalation_info.required).lower()
+        }
+    )
 
 
 @app.get("/stats")
 async def get_system_stats():
     """Get system statistics."""
-    global knowledge_base
+    global knowledge_base, classifier
     
     if not knowledge_base:
         raise HTTPException(status_code=503, detail="Knowledge base not loaded")
@@ -258,7 +385,10 @@ async def get_system_stats():
             "troubleshooting_procedures": len(knowledge_base.troubleshooting_steps),
             "documents": len(knowledge_base.documents)
         },
-        "categories": list(knowledge_base.categories.keys())
+        "categories": category_names,
+        "classifier": {
+            "reclassifications": classifier.reclassification_count if classifier else 0
+        }
     }
 
 
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, Field
+from functools import cached_property
+
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 
 
@@ -8,10 +10,10 @@ class Category(BaseModel):
     name: str = Field(..., description="Category name")
     description: str = Field(..., description="Category description")
     typical_resolution_time: str = Field(..., description="Expected resolution time")
-    escalation_triggers: List[str] = Field(default=[], description="Conditions that trigger escalation")
+    escalation_triggers: List[str] = Field(default_factory=list, description="Conditions that trigger escalation")
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "name": "password_reset",
                 "description": "Password-related issues including resets, lockouts, and policy questions",
@@ -19,6 +21,7 @@ class Category(BaseModel):
                 "escalation_triggers": ["Multiple failed resets", "Account security concerns"]
             }
         }
+    )
 
 
 class CommonIssue(BaseModel):
@@ -34,11 +37,16 @@ class InstallationGuide(BaseModel):
     software: str = Field(..., description="Software name")
     title: str = Field(..., description="Guide title")
     steps: List[str] = Field(..., description="Installation steps")
-    common_issues: List[CommonIssue] = Field(default=[], description="Common issues and solutions")
+    common_issues: List[CommonIssue] = Field(default_factory=list, description="Common issues and solutions")
     support_contact: str = Field(..., description="Support contact for this software")
     
-    class Config:
-        schema_extra = {
+    @cached_property
+    def steps_text(self) -> str:
+        """Steps joined into one sentence-separated string, built once per instance."""
+        return ". ".join(self.steps)
+    
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "software": "slack",
                 "title": "Installing Slack Desktop App",
@@ -55,6 +63,7 @@ class InstallationGuide(BaseModel):
                 "support_contact": "it-support@techcorp.com"
             }
         }
+    )
 
 
 class TroubleshootingStep(BaseModel):
@@ -66,8 +75,13 @@ class TroubleshootingStep(BaseModel):
     escalation_trigger: str = Field(..., description="When to escalate")
     escalation_contact: str = Field(..., description="Who to escalate to")
     
-    class Config:
-        schema_extra = {
+    @cached_property
+    def steps_text(self) -> str:
+        """Steps joined into one sentence-separated string, built once per instance."""
+        return ". ".join(self.steps)
+    
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "issue_type": "password_reset",
                 "category": "Authentication",
@@ -79,6 +93,7 @@ class TroubleshootingStep(BaseModel):
                 "escalation_contact": "security@techcorp.com"
             }
         }
+    )
 
 
 class KnowledgeDocument(BaseModel):
@@ -86,15 +101,16 @@ class KnowledgeDocument(BaseModel):
     
     source: str = Field(..., description="Source file name")
     content: str = Field(..., description="Document content")
-    metadata: Dict[str, Any] = Field(default={}, description="Additional metadata")
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
     embeddings: Optional[List[float]] = Field(None, description="Vector embeddings")
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "source": "company_it_policies.md",
                 "content": "Password Policy - Minimum 12 characters...",
                 "metadata": {"section": "Password Policy", "category": "security"},
                 "embeddings": [0.1, 0.2, 0.3]  # Simplified example
             }
-        }
\ No newline at end of file
+        }
+    )
\ No newline at end of file
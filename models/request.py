@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from datetime import datetime
 
@@ -10,14 +10,15 @@ class UserRequest(BaseModel):
     user_id: Optional[str] = Field(None, description="Optional user identifier")
     priority: Optional[str] = Field("normal", description="Request priority (low, normal, high, urgent)")
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "message": "I forgot my password and can't log into my computer. How do I reset it?",
                 "user_id": "john.doe@techcorp.com",
                 "priority": "normal"
             }
         }
+    )
 
 
 class HelpDeskRequest(BaseModel):
@@ -33,8 +34,8 @@ class HelpDeskRequest(BaseModel):
     category: Optional[str] = Field(None, description="Classified category")
     confidence: Optional[float] = Field(None, description="Classification confidence score")
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "id": "req_001",
                 "message": "I forgot my password and can't log into my computer",
@@ -44,4 +45,5 @@ class HelpDeskRequest(BaseModel):
                 "category": "password_reset",
                 "confidence": 0.95
             }
-        }
\ No newline at end of file
+        }
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -10,14 +10,16 @@ class ClassificationResult(BaseModel):
     confidence: float = Field(..., description="Classification confidence (0-1)")
     reasoning: Optional[str] = Field(None, description="Explanation of classification")
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "category": "password_reset",
                 "confidence": 0.95,
                 "reasoning": "User explicitly mentions forgotten password and login issues"
             }
         }
+    )
 
 
 class KnowledgeItem(BaseModel):
@@ -27,14 +29,16 @@ class KnowledgeItem(BaseModel):
     source: str = Field(..., description="Source document/section")
     relevance_score: float = Field(..., description="Relevance score (0-1)")
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "content": "Go to https://password.techcorp.com and enter your company email",
                 "source": "troubleshooting_database.json:password_reset",
                 "relevance_score": 0.89
             }
         }
+    )
 
 
 class EscalationInfo(BaseModel):
@@ -45,8 +49,9 @@ class EscalationInfo(BaseModel):
     contact: Optional[str] = Field(None, description="Escalation contact")
     urgency: Optional[str] = Field(None, description="Escalation urgency level")
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "required": True,
                 "reason": "Hardware failure requiring immediate attention",
@@ -54,6 +59,7 @@ class EscalationInfo(BaseModel):
                 "urgency": "high"
             }
         }
+    )
 
 
 class HelpDeskResponse(BaseModel):
@@ -67,7 +73,7 @@ class HelpDeskResponse(BaseModel):
     classification: ClassificationResult = Field(..., description="Classification details")
     
     # Knowledge retrieval
-    knowledge_items: List[KnowledgeItem] = Field(default=[], description="Retrieved knowledge items")
+    knowledge_items: List[KnowledgeItem] = Field(default_factory=list, description="Retrieved knowledge items")
     
     # Escalation information
     escalation: EscalationInfo = Field(..., description="Escalation details")
@@ -76,8 +82,8 @@ class HelpDeskResponse(BaseModel):
     processing_time: float = Field(..., description="Total processing time in seconds")
     timestamp: datetime = Field(default_factory=datetime.now, description="Response timestamp")
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "request_id": "req_001",
                 "category": "password_reset",
@@ -103,4 +109,5 @@ class HelpDeskResponse(BaseModel):
                 "processing_time": 1.23,
                 "timestamp": "2025-06-26T10:30:15Z"
             }
-        }
\ No newline at end of file
+        }
+    )
\ No newline at end of file
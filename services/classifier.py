@@ -1,16 +1,191 @@
-import json
-from typing import List, Dict, Any
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import numpy as np
+import orjson
 from openai import AsyncOpenAI
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 from models.response import ClassificationResult
+from utils.batching import MicroBatcher
+
+
+logger = logging.getLogger(__name__)
+
+
+CLASSIFIER_SYSTEM_PROMPT = (
+    "You are an expert IT help desk classifier. Analyze user requests and classify them "
+    "into the most appropriate category with high accuracy."
+)
+
+# A classification is a ~50 token JSON object; this caps runaway generation
+CLASSIFICATION_MAX_TOKENS = 120
+
+# Category descriptions for better classification
+CATEGORY_DESCRIPTIONS = {
+    "password_reset": "Password-related issues including resets, lockouts, forgotten passwords, and password policy questions",
+    "software_installation": "Issues with installing, updating, or configuring software applications",
+    "hardware_failure": "Physical hardware problems requiring repair or replacement (laptops, monitors, keyboards, etc.)",
+    "network_connectivity": "Network access issues including WiFi, VPN, internet connectivity, and network configuration",
+    "email_configuration": "Email setup, synchronization, configuration issues, and mailbox problems",
+    "security_incident": "Potential security threats, malware, suspicious activity, or cybersecurity concerns",
+    "policy_question": "Questions about company IT policies, procedures, and general IT guidance"
+}
+
+# Keyword patterns used by the fallback classifier
+CATEGORY_KEYWORDS = {
+    "password_reset": ["password", "login", "forgot", "reset", "locked", "lockout", "sign in"],
+    "software_installation": ["install", "software", "application", "app", "download", "setup"],
+    "hardware_failure": ["broken", "not working", "hardware", "screen", "laptop", "monitor", "keyboard"],
+    "network_connectivity": ["wifi", "internet", "vpn", "network", "connectivity", "connection"],
+    "email_configuration": ["email", "outlook", "sync", "mailbox", "mail"],
+    "security_incident": ["virus", "malware", "security", "suspicious", "hacked", "threat"],
+    "policy_question": ["policy", "procedure", "allowed", "rules", "guidelines"]
+}
+
+
+# Keyword/category incidence matrix so all category scores come from one matrix-vector product
+_KEYWORDS = sorted({keyword for keywords in CATEGORY_KEYWORDS.values() for keyword in keywords})
+_KEYWORD_INDEX = {keyword: i for i, keyword in enumerate(_KEYWORDS)}
+_CATEGORY_ROWS = {category: row for row, category in enumerate(CATEGORY_KEYWORDS)}
+_KEYWORD_MATRIX = np.zeros((len(_CATEGORY_ROWS), len(_KEYWORDS)), dtype=np.float32)
+for _category, _keywords in CATEGORY_KEYWORDS.items():
+    for _keyword in _keywords:
+        _KEYWORD_MATRIX[_CATEGORY_ROWS[_category], _KEYWORD_INDEX[_keyword]] = 1.0
+
+# Keywords match at the start of a word, so inflections count ("installing", "passwords",
+# "emails") while embedded hits do not ("app" in "happy"). The lookahead is zero-width so
+# every word start is tried; keywords sharing a start with a longer match ("app" for
+# "application") are added from _KEYWORD_PREFIXES, as both occur in the message
+_KEYWORD_PATTERN = re.compile(
+    r"\b(?=(" + "|".join(map(re.escape, sorted(_KEYWORDS, key=len, reverse=True))) + r"))"
+)
+_KEYWORD_PREFIXES = {
+    keyword: [_KEYWORD_INDEX[other] for other in _KEYWORDS if keyword.startswith(other)]
+    for keyword in _KEYWORDS
+}
+
+
+def _starts_word(text: str, start: int) -> bool:
+    """Check that position start begins a word (regex \\b semantics before a word character)."""
+    return start == 0 or not (text[start - 1].isalnum() or text[start - 1] == "_")
+
+
+@lru_cache(maxsize=32)
+def _category_block(categories: Tuple[str, ...]) -> str:
+    """Render the category list section shared by the classification prompts."""
+    lines = []
+    for category in categories:
+        description = CATEGORY_DESCRIPTIONS.get(category, "General IT support category")
+        lines.append(f"- {category}: {description}\n")
+    return "".join(lines)
+
+
+@lru_cache(maxsize=32)
+def _classification_prompt_template(categories: Tuple[str, ...]) -> str:
+    """Render the single-request prompt once per category set, leaving {user_message} open."""
+    category_block = _category_block(categories).replace("{", "{{").replace("}", "}}")
+    
+    return """
+Classify the following IT help desk request into one of the predefined categories.
+
+USER REQUEST: "{user_message}"
+
+AVAILABLE CATEGORIES:
+""" + category_block + """
+
+CLASSIFICATION REQUIREMENTS:
+1. Choose the MOST APPROPRIATE category based on the user's primary issue
+2. Provide a confidence score between 0.0 and 1.0 (1.0 = completely certain)
+3. Explain your reasoning briefly
+
+RESPONSE FORMAT (JSON):
+{{
+    "category": "selected_category_name",
+    "confidence": 0.95,
+    "reasoning": "Brief explanation of why this category was chosen"
+}}
+
+Key classification guidelines:
+- If user mentions "password", "login", "forgot", "locked out" → password_reset
+- If user mentions "install", "software", "application", "download" → software_installation  
+- If user mentions "broken", "not working", "hardware", "screen", "laptop" → hardware_failure
+- If user mentions "WiFi", "internet", "VPN", "network", "connectivity" → network_connectivity
+- If user mentions "email", "Outlook", "sync", "mailbox" → email_configuration
+- If user mentions "virus", "malware", "security", "suspicious", "hacked" → security_incident
+- If user asks about "policy", "procedure", "allowed", "rules" → policy_question
+
+Provide your classification:"""
 
 
 class RequestClassifier:
     """Classifies help desk requests into predefined categories using OpenAI."""
     
-    def __init__(self, api_key: str, model: str = "gpt-4"):
-        self.client = AsyncOpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        use_cache: bool = True,
+        cache_size: int = 1024,
+        cache_path: Optional[str] = None,
+        batch_size: int = 1,
+        batch_window: float = 0.02,
+        client: Optional[AsyncOpenAI] = None,
+        review_model: Optional[str] = None,
+        review_threshold: float = 0.6
+    ):
+        # A shared client lets several services reuse one connection pool
+        self.client = client or AsyncOpenAI(api_key=api_key)
         self.model = model
+        self.temperature = 0.1  # Low temperature for consistent classification
+        
+        # Low-confidence results get a second opinion from a stronger model
+        self.review_model = review_model
+        self.review_threshold = review_threshold
+        self.reclassification_count = 0
+        
+        # In-process LRU cache of classification results, optionally backed by SQLite
+        self.use_cache = use_cache
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # SQLite calls run in worker threads, serialized on the one connection; writes happen
+        # in the background so a response never waits for a commit
+        self._cache_db: Optional[sqlite3.Connection] = None
+        self._cache_db_lock = threading.Lock()
+        self._cache_writes: Set[asyncio.Task] = set()
+        if use_cache and cache_path:
+            self._cache_db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._cache_db.execute(
+                "CREATE TABLE IF NOT EXISTS classification_cache ("
+                "hash TEXT PRIMARY KEY, category TEXT, confidence REAL, reasoning TEXT, ts REAL)"
+            )
+            self._cache_db.commit()
+        
+        # Single automaton over every fallback keyword (pyahocorasick is optional)
+        self._keyword_automaton = None
+        if ahocorasick is not None:
+            self._keyword_automaton = ahocorasick.Automaton()
+            for keyword in _KEYWORDS:
+                self._keyword_automaton.add_word(keyword, _KEYWORD_INDEX[keyword])
+            self._keyword_automaton.make_automaton()
+        
+        # Micro-batch concurrent classifications into shared API calls
+        self._batcher: Optional[MicroBatcher] = None
+        if batch_size > 1:
+            self._batcher = MicroBatcher(self._classify_batch, batch_size, batch_window)
     
     async def classify_request(self, user_message: str, categories: List[str]) -> ClassificationResult:
         """
@@ -24,181 +199,377 @@ class RequestClassifier:
             ClassificationResult with category, confidence, and reasoning
         """
         
-        # Create the classification prompt
-        prompt = self._create_classification_prompt(user_message, categories)
+        # Identical requests are answered from the cache; sampling at higher
+        # temperatures is not deterministic enough to memoize
+        cacheable = self.use_cache and self.temperature <= 0.2
+        cache_key = self._cache_key(user_message, categories) if cacheable else None
+        if cache_key:
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                return cached
         
         try:
-            # Call OpenAI API
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert IT help desk classifier. Analyze user requests and classify them into the most appropriate category with high accuracy."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                temperature=0.1,  # Low temperature for consistent classification
-                max_tokens=500
-            )
-            
-            # Parse the response
-            result = self._parse_classification_response(
-                response.choices[0].message.content,
-                categories,
-                user_message
-            )
+            if self._batcher is not None:
+                # Concurrent requests are coalesced into a single API call
+                result, from_model = await self._batcher.submit((user_message, tuple(categories)))
+            else:
+                result, from_model = await self._classify_single(user_message, categories)
             
-            return result
+            if self._needs_review(result):
+                result, from_model = await self._review_classification(user_message, categories, result, from_model)
             
         except Exception as e:
-            print(f"Error in request classification: {e}")
+            logger.exception("Error in request classification")
             # Fallback to default classification
             return ClassificationResult(
                 category="policy_question",  # Safe default
                 confidence=0.1,
                 reasoning=f"Classification failed: {str(e)}"
             )
+        
+        # Keyword fallbacks after an unparseable reply are not cached, so the next call retries the model
+        if cache_key and from_model:
+            self._cache_set(cache_key, result)
+        
+        return result
+    
+    async def close(self):
+        """Stop the batching worker, if any, flush pending cache writes and release the cache database."""
+        if self._batcher is not None:
+            await self._batcher.close()
+        if self._cache_writes:
+            await asyncio.gather(*self._cache_writes, return_exceptions=True)
+        if self._cache_db is not None:
+            with self._cache_db_lock:
+                self._cache_db.close()
+                self._cache_db = None
+    
+    def _needs_review(self, result: ClassificationResult) -> bool:
+        """Check whether a result is uncertain enough to ask the review model."""
+        return (
+            self.review_model is not None
+            and self.review_model != self.model
+            and result.confidence < self.review_threshold
+        )
+    
+    async def _review_classification(
+        self,
+        user_message: str,
+        categories: List[str],
+        result: ClassificationResult,
+        from_model: bool
+    ) -> Tuple[ClassificationResult, bool]:
+        """Reclassify with the review model, keeping the original result if that call fails."""
+        
+        self.reclassification_count += 1
+        try:
+            return await self._classify_single(user_message, categories, model=self.review_model)
+        except Exception as e:
+            logger.warning("Review classification failed, keeping original result: %s", e)
+            return result, from_model
+    
+    async def _classify_single(
+        self,
+        user_message: str,
+        categories: List[str],
+        model: Optional[str] = None
+    ) -> Tuple[ClassificationResult, bool]:
+        """Classify one message with its own OpenAI call; the flag is False for keyword fallbacks."""
+        
+        # Create the classification prompt
+        prompt = self._create_classification_prompt(user_message, categories)
+        
+        # Call OpenAI API
+        response = await self.client.chat.completions.create(
+            model=model or self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": CLASSIFIER_SYSTEM_PROMPT
+                },
+                {
+                    "role": "user", 
+                    "content": prompt
+                }
+            ],
+            temperature=self.temperature,
+            max_tokens=CLASSIFICATION_MAX_TOKENS,
+            response_format={"type": "json_object"}
+        )
+        
+        # Parse the response
+        return self._parse_classification_response(
+            response.choices[0].message.content,
+            categories,
+            user_message
+        )
+    
+    async def _classify_batch(
+        self,
+        items: List[Tuple[str, Tuple[str, ...]]]
+    ) -> List[Tuple[ClassificationResult, bool]]:
+        """
+        Classify a batch of queued requests, one OpenAI call per category set.
+        
+        Args:
+            items: (user_message, categories) pairs collected by the batcher
+            
+        Returns:
+            (ClassificationResult, parsed from the model) pairs in the same order as items
+        """
+        
+        # Requests are normally submitted with the same category list
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for index, (_, categories) in enumerate(items):
+            groups.setdefault(categories, []).append(index)
+        
+        results: List[Optional[Tuple[ClassificationResult, bool]]] = [None] * len(items)
+        
+        async def classify_group(categories: Tuple[str, ...], indices: List[int]):
+            messages = [items[i][0] for i in indices]
+            if len(messages) == 1:
+                group_results = [await self._classify_single(messages[0], list(categories))]
+            else:
+                group_results = await self._classify_many(messages, list(categories))
+            for i, result in zip(indices, group_results):
+                results[i] = result
+        
+        await asyncio.gather(*(classify_group(cats, idx) for cats, idx in groups.items()))
+        return results
+    
+    async def _classify_many(
+        self,
+        user_messages: List[str],
+        categories: List[str]
+    ) -> List[Tuple[ClassificationResult, bool]]:
+        """Classify several messages with a single OpenAI call returning all results."""
+        
+        prompt = self._create_batch_classification_prompt(user_messages, categories)
+        
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": CLASSIFIER_SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=self.temperature,
+            max_tokens=CLASSIFICATION_MAX_TOKENS * len(user_messages),
+            response_format={"type": "json_object"}
+        )
+        
+        return self._parse_batch_classification_response(
+            response.choices[0].message.content,
+            categories,
+            user_messages
+        )
+    
+    def _cache_key(self, user_message: str, categories: List[str]) -> str:
+        """Build a stable cache key from the model, normalized message and category set."""
+        raw = self.model + "|" + user_message.strip().lower() + "|" + ",".join(sorted(categories))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    async def _cache_get(self, key: str) -> Optional[ClassificationResult]:
+        """Look up a cached classification, promoting SQLite hits into memory."""
+        data = self._cache.get(key)
+        if data is not None:
+            self._cache.move_to_end(key)
+            return ClassificationResult(**data)
+        
+        if self._cache_db is None:
+            return None
+        
+        row = await asyncio.to_thread(self._cache_db_read, key)
+        if row is None:
+            return None
+        
+        result = ClassificationResult(category=sys.intern(row[0]), confidence=row[1], reasoning=row[2])
+        self._remember(key, result)
+        return result
+    
+    def _cache_set(self, key: str, result: ClassificationResult):
+        """Store a classification in memory and, if configured, write it to SQLite in the background."""
+        self._remember(key, result)
+        
+        if self._cache_db is not None:
+            row = (key, result.category, result.confidence, result.reasoning, time.time())
+            task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._cache_db_write, row))
+            self._cache_writes.add(task)
+            task.add_done_callback(self._cache_write_done)
+    
+    def _cache_db_read(self, key: str) -> Optional[Tuple[str, float, str]]:
+        """Fetch one cached row (runs in a worker thread)."""
+        with self._cache_db_lock:
+            if self._cache_db is None:
+                return None
+            return self._cache_db.execute(
+                "SELECT category, confidence, reasoning FROM classification_cache WHERE hash = ?",
+                (key,)
+            ).fetchone()
+    
+    def _cache_db_write(self, row: Tuple[str, str, float, str, float]):
+        """Insert or replace one cached row (runs in a worker thread)."""
+        with self._cache_db_lock:
+            if self._cache_db is None:
+                return
+            self._cache_db.execute("INSERT OR REPLACE INTO classification_cache VALUES (?, ?, ?, ?, ?)", row)
+            self._cache_db.commit()
+    
+    def _cache_write_done(self, task: asyncio.Task):
+        """Forget a finished background write, logging it if it failed."""
+        self._cache_writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Failed to persist classification cache entry", exc_info=task.exception())
+    
+    def _remember(self, key: str, result: ClassificationResult):
+        """Insert into the in-process LRU, evicting the least recently used entry."""
+        self._cache[key] = result.model_dump()
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
     
     def _create_classification_prompt(self, user_message: str, categories: List[str]) -> str:
         """Create a detailed prompt for request classification."""
         
-        # Category descriptions for better classification
-        category_descriptions = {
-            "password_reset": "Password-related issues including resets, lockouts, forgotten passwords, and password policy questions",
-            "software_installation": "Issues with installing, updating, or configuring software applications",
-            "hardware_failure": "Physical hardware problems requiring repair or replacement (laptops, monitors, keyboards, etc.)",
-            "network_connectivity": "Network access issues including WiFi, VPN, internet connectivity, and network configuration",
-            "email_configuration": "Email setup, synchronization, configuration issues, and mailbox problems",
-            "security_incident": "Potential security threats, malware, suspicious activity, or cybersecurity concerns",
-            "policy_question": "Questions about company IT policies, procedures, and general IT guidance"
-        }
-        
-        prompt = f"""
-Classify the following IT help desk request into one of the predefined categories.
-
-USER REQUEST: "{user_message}"
+        template = _classification_prompt_template(tuple(categories))
+        return template.format(user_message=user_message)
+    
+    def _create_batch_classification_prompt(self, user_messages: List[str], categories: List[str]) -> str:
+        """Create a prompt asking for one classification per numbered request."""
+        
+        prompt = """
+Classify each of the following IT help desk requests into one of the predefined categories.
 
-AVAILABLE CATEGORIES:
+USER REQUESTS:
 """
         
-        for category in categories:
-            description = category_descriptions.get(category, "General IT support category")
-            prompt += f"- {category}: {description}\n"
+        for i, message in enumerate(user_messages, 1):
+            prompt += f'{i}. "{message}"\n'
+        
+        prompt += "\nAVAILABLE CATEGORIES:\n"
+        prompt += _category_block(tuple(categories))
         
         prompt += f"""
-
 CLASSIFICATION REQUIREMENTS:
-1. Choose the MOST APPROPRIATE category based on the user's primary issue
+1. Classify every request independently, choosing the MOST APPROPRIATE category
 2. Provide a confidence score between 0.0 and 1.0 (1.0 = completely certain)
 3. Explain your reasoning briefly
 
-RESPONSE FORMAT (JSON):
+RESPONSE FORMAT (JSON object whose "classifications" array has exactly {len(user_messages)} entries, in request order):
 {{
-    "category": "selected_category_name",
-    "confidence": 0.95,
-    "reasoning": "Brief explanation of why this category was chosen"
+    "classifications": [
+        {{
+            "category": "selected_category_name",
+            "confidence": 0.95,
+            "reasoning": "Brief explanation of why this category was chosen"
+        }}
+    ]
 }}
 
-Key classification guidelines:
-- If user mentions "password", "login", "forgot", "locked out" → password_reset
-- If user mentions "install", "software", "application", "download" → software_installation  
-- If user mentions "broken", "not working", "hardware", "screen", "laptop" → hardware_failure
-- If user mentions "WiFi", "internet", "VPN", "network", "connectivity" → network_connectivity
-- If user mentions "email", "Outlook", "sync", "mailbox" → email_configuration
-- If user mentions "virus", "malware", "security", "suspicious", "hacked" → security_incident
-- If user asks about "policy", "procedure", "allowed", "rules" → policy_question
-
-Provide your classification:"""
+Provide your classifications:"""
         
         return prompt
     
-    def _parse_classification_response(self, response_text: str, categories: List[str], user_message: str) -> ClassificationResult:
-        """Parse the OpenAI response into a ClassificationResult."""
+    def _parse_classification_response(
+        self,
+        response_text: str,
+        categories: List[str],
+        user_message: str
+    ) -> Tuple[ClassificationResult, bool]:
+        """
+        Parse the OpenAI response into a ClassificationResult.
+        
+        Returns:
+            The result and whether it was parsed from the model (False for the keyword fallback)
+        """
         
         try:
-            # Try to parse as JSON
-            response_text = response_text.strip()
-            
-            # Extract JSON if it's wrapped in markdown code blocks
-            if "```json" in response_text:
-                start = response_text.find("```json") + 7
-                end = response_text.find("```", start)
-                response_text = response_text[start:end].strip()
-            elif "```" in response_text:
-                start = response_text.find("```") + 3
-                end = response_text.find("```", start)
-                response_text = response_text[start:end].strip()
+            # JSON mode guarantees a bare JSON object, so no fence stripping is needed
+            parsed = orjson.loads(response_text)
             
-            # Parse JSON
-            parsed = json.loads(response_text)
+            return self._build_classification(parsed, categories), True
             
-            category = parsed.get("category", "").strip()
-            confidence = float(parsed.get("confidence", 0.0))
-            reasoning = parsed.get("reasoning", "").strip()
-            
-            # Validate category
-            if category not in categories:
-                # Try to find closest match
-                category_lower = category.lower()
-                for valid_cat in categories:
-                    if category_lower in valid_cat.lower() or valid_cat.lower() in category_lower:
-                        category = valid_cat
-                        break
-                else:
-                    # Default fallback
-                    category = "policy_question"
-                    confidence = max(0.1, confidence * 0.5)  # Reduce confidence
-                    reasoning = f"Original category '{category}' not found. {reasoning}"
-            
-            # Validate confidence
-            confidence = max(0.0, min(1.0, confidence))
-            
-            return ClassificationResult(
-                category=category,
-                confidence=confidence,
-                reasoning=reasoning or "No reasoning provided"
-            )
-            
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
-            print(f"Failed to parse classification response: {e}")
-            print(f"Response text: {response_text}")
+        except (ValueError, KeyError, AttributeError) as e:
+            logger.warning("Failed to parse classification response: %s; response text: %r", e, response_text)
             
             # Fallback classification using keyword matching
-            return self._fallback_classification(user_message, categories)
+            return self._fallback_classification(user_message, categories), False
+    
+    def _parse_batch_classification_response(
+        self,
+        response_text: str,
+        categories: List[str],
+        user_messages: List[str]
+    ) -> List[Tuple[ClassificationResult, bool]]:
+        """Parse a batch of classifications, falling back per message on bad entries (flagged False)."""
+        
+        try:
+            parsed = orjson.loads(response_text).get("classifications", [])
+        except (ValueError, AttributeError) as e:
+            logger.warning("Failed to parse batch classification response: %s", e)
+            parsed = []
+        
+        if not isinstance(parsed, list):
+            parsed = []
+        
+        results = []
+        for i, message in enumerate(user_messages):
+            try:
+                results.append((self._build_classification(parsed[i], categories), True))
+            except (IndexError, ValueError, KeyError, AttributeError, TypeError):
+                results.append((self._fallback_classification(message, categories), False))
+        
+        return results
+    
+    def _build_classification(self, parsed: Dict[str, Any], categories: List[str]) -> ClassificationResult:
+        """Validate a parsed classification object against the known categories."""
+        
+        category = parsed.get("category", "").strip()
+        confidence = float(parsed.get("confidence", 0.0))
+        reasoning = parsed.get("reasoning", "").strip()
+        
+        # Validate category
+        if category not in categories:
+            # Try to find closest match
+            category_lower = category.lower()
+            for valid_cat in categories:
+                if category_lower in valid_cat.lower() or valid_cat.lower() in category_lower:
+                    category = valid_cat
+                    break
+            else:
+                # Default fallback
+                category = "policy_question"
+                confidence = max(0.1, confidence * 0.5)  # Reduce confidence
+                reasoning = f"Original category '{category}' not found. {reasoning}"
+        
+        # Validate confidence
+        confidence = max(0.0, min(1.0, confidence))
+        
+        # Interned so downstream dict lookups on the category compare by identity
+        return ClassificationResult(
+            category=sys.intern(category),
+            confidence=confidence,
+            reasoning=reasoning or "No reasoning provided"
+        )
     
     def _fallback_classification(self, message: str, categories: List[str]) -> ClassificationResult:
         """Fallback classification using simple keyword matching."""
         
         message_lower = message.lower()
         
-        # Define keyword patterns for each category
-        patterns = {
-            "password_reset": ["password", "login", "forgot", "reset", "locked", "lockout", "sign in"],
-            "software_installation": ["install", "software", "application", "app", "download", "setup"],
-            "hardware_failure": ["broken", "not working", "hardware", "screen", "laptop", "monitor", "keyboard"],
-            "network_connectivity": ["wifi", "internet", "vpn", "network", "connectivity", "connection"],
-            "email_configuration": ["email", "outlook", "sync", "mailbox", "mail"],
-            "security_incident": ["virus", "malware", "security", "suspicious", "hacked", "threat"],
-            "policy_question": ["policy", "procedure", "allowed", "rules", "guidelines"]
-        }
-        
-        # Score each category
-        scores = {}
-        for category in categories:
-            if category in patterns:
-                score = sum(1 for keyword in patterns[category] if keyword in message_lower)
-                if score > 0:
-                    scores[category] = score
+        # Score each category by the number of distinct keywords present
+        scores = self._score_keywords(message_lower, categories)
         
         if scores:
             # Get category with highest score
             best_category = max(scores, key=scores.get)
             confidence = min(0.8, scores[best_category] / 3.0)  # Conservative confidence
-            reasoning = f"Fallback classification based on keywords: {patterns[best_category]}"
+            reasoning = f"Fallback classification based on keywords: {CATEGORY_KEYWORDS[best_category]}"
         else:
             # Ultimate fallback
             best_category = "policy_question"
@@ -206,7 +577,33 @@ Provide your classification:"""
             reasoning = "No clear indicators found, defaulting to policy question"
         
         return ClassificationResult(
-            category=best_category,
+            category=sys.intern(best_category),
             confidence=confidence,
             reasoning=reasoning
-        )
\ No newline at end of file
+        )
+    
+    def _score_keywords(self, message_lower: str, categories: List[str]) -> Dict[str, int]:
+        """Count the distinct fallback keywords of each category found in the message."""
+        
+        if self._keyword_automaton is not None:
+            matched = [
+                index for end, index in self._keyword_automaton.iter(message_lower)
+                if _starts_word(message_lower, end - len(_KEYWORDS[index]) + 1)
+            ]
+        else:
+            matched = [
+                index for keyword in _KEYWORD_PATTERN.findall(message_lower)
+                for index in _KEYWORD_PREFIXES[keyword]
+            ]
+        
+        presence = np.zeros(len(_KEYWORDS), dtype=np.float32)
+        presence[matched] = 1.0
+        category_scores = _KEYWORD_MATRIX @ presence
+        
+        # Preserve the caller's category order so ties resolve as before
+        scores = {}
+        for category in categories:
+            row = _CATEGORY_ROWS.get(category)
+            if row is not None and category_scores[row] > 0:
+                scores[category] = int(category_scores[row])
+        return scores
@@ -1,15 +1,55 @@
-from typing import Dict, List
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 from models.response import EscalationInfo
 from utils import KnowledgeBase
 
 
+# Phrase groups that, together with a category trigger containing the group name, require escalation
+TRIGGER_PHRASE_GROUPS: Dict[str, FrozenSet[str]] = {
+    "reset": frozenset({
+        "multiple failed", "failed multiple", "several attempts",
+        "tried many times", "keep failing", "still not working"
+    }),
+    "security": frozenset({
+        "security concern", "account compromised", "suspicious activity",
+        "unauthorized access", "strange behavior"
+    }),
+    "approval": frozenset({
+        "new software", "install software", "need approval",
+        "not approved", "custom software"
+    }),
+    "infrastructure": frozenset({
+        "network down", "wifi down", "internet down", "can't connect",
+        "no one can", "everyone having", "whole office"
+    })
+}
+
+# Classifications less confident than this are escalated for human review
+LOW_CONFIDENCE_ESCALATION_THRESHOLD = 0.3
+
+
 class EscalationManager:
     """Manages escalation logic based on categories, triggers, and confidence levels."""
     
-    def __init__(self, knowledge_base: KnowledgeBase):
+    def __init__(self, knowledge_base: KnowledgeBase, cache_size: int = 4096):
         self.knowledge_base = knowledge_base
         
-        # Define escalation contacts for each category
+        # LRU of recent decisions; checks run in worker threads, hence the lock
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str, Optional[float]], EscalationInfo]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Define escalation contacts for each category (interned, as are classifier categories)
+        self.default_contact = sys.intern("it-support@techcorp.com")
         self.escalation_contacts = {
             "password_reset": "security@techcorp.com",
             "software_installation": "software-support@techcorp.com",
@@ -19,6 +59,9 @@ class EscalationManager:
             "security_incident": "security@techcorp.com",
             "policy_question": "it-support@techcorp.com"
         }
+        self.escalation_contacts = {
+            sys.intern(name): sys.intern(contact) for name, contact in self.escalation_contacts.items()
+        }
         
         # Categories that always require escalation
         self.auto_escalate_categories = {
@@ -47,6 +90,74 @@ class EscalationManager:
             "data loss": "critical",
             "corrupted": "high"
         }
+        
+        # Keywords ordered from most to least urgent, so the first match wins
+        urgency_levels = {"low": 1, "medium": 2, "high": 3, "critical": 4}
+        self._keywords_by_urgency = sorted(
+            self.escalation_keywords.items(),
+            key=lambda item: urgency_levels.get(item[1], 0),
+            reverse=True
+        )
+        
+        # Escalation reason for each trigger phrase group
+        self.trigger_reasons = {
+            "reset": "Multiple failed attempts detected: {}",
+            "security": "Security concern identified: {}",
+            "approval": "Approval required: {}",
+            "infrastructure": "Infrastructure issue detected: {}"
+        }
+        
+        # Per category, the (phrase group, trigger) pairs in the order they are checked
+        self._category_trigger_index: Dict[str, List[Tuple[str, str]]] = {
+            sys.intern(name): [
+                (group, trigger)
+                for trigger in category.escalation_triggers
+                for group in TRIGGER_PHRASE_GROUPS
+                if group in trigger.lower()
+            ]
+            for name, category in knowledge_base.categories.items()
+        }
+        
+        # Urgency indicators, checked from most to least urgent
+        self.urgency_indicators = {
+            "critical": [
+                "emergency", "critical", "urgent", "asap", "immediately",
+                "production down", "server down", "system down",
+                "data loss", "corrupted", "virus", "hacked", "malware"
+            ],
+            "high": [
+                "important meeting", "deadline", "presentation",
+                "can't work", "blocking", "stopped working",
+                "multiple people", "department", "team affected"
+            ],
+            "medium": [
+                "soon", "today", "this morning", "this afternoon",
+                "affecting work", "slowing down"
+            ]
+        }
+        
+        # Every phrase any check looks for, matched in one pass (pyahocorasick is optional)
+        self._phrases = set(self.escalation_keywords)
+        for phrases in TRIGGER_PHRASE_GROUPS.values():
+            self._phrases.update(phrases)
+        for indicators in self.urgency_indicators.values():
+            self._phrases.update(indicators)
+        
+        # Fallback: one compiled alternation (longest first) tried at every position; shorter
+        # phrases contained in a match are added back from a precomputed closure
+        ordered = sorted(self._phrases, key=lambda phrase: (-len(phrase), phrase))
+        self._phrase_pattern = re.compile("(?=(" + "|".join(map(re.escape, ordered)) + "))")
+        self._implied_phrases: Dict[str, Set[str]] = {
+            phrase: {other for other in self._phrases if other in phrase}
+            for phrase in self._phrases
+        }
+        
+        self._phrase_automaton = None
+        if ahocorasick is not None:
+            self._phrase_automaton = ahocorasick.Automaton()
+            for phrase in self._phrases:
+                self._phrase_automaton.add_word(phrase, phrase)
+            self._phrase_automaton.make_automaton()
     
     def check_escalation(
         self, 
@@ -66,42 +177,70 @@ class EscalationManager:
             EscalationInfo with escalation decision and details
         """
         
+        # Confidence only matters (and appears in the reason) below the low-confidence escalation threshold
+        low_confidence = confidence < LOW_CONFIDENCE_ESCALATION_THRESHOLD
+        cache_key = (category, user_message, confidence if low_confidence else None)
+        with self._cache_lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return cached
+        
+        escalation_info = self._evaluate_escalation(category, user_message, confidence)
+        
+        if self.cache_size > 0:
+            with self._cache_lock:
+                self._cache[cache_key] = escalation_info
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
+        return escalation_info
+    
+    def _evaluate_escalation(self, category: str, user_message: str, confidence: float) -> EscalationInfo:
+        """Run the escalation rules in priority order."""
+        
+        contact = self.escalation_contacts.get(category, self.default_contact)
+        
         # Check for automatic escalation categories
-        if category in self.auto_escalate_categories:
+        auto_reason = self.auto_escalate_categories.get(category)
+        if auto_reason:
             return EscalationInfo(
                 required=True,
-                reason=self.auto_escalate_categories[category],
-                contact=self.escalation_contacts.get(category, "it-support@techcorp.com"),
+                reason=auto_reason,
+                contact=contact,
                 urgency="high" if category == "security_incident" else "medium"
             )
         
+        # Lowercase and scan the message once for every check below
+        found = self._find_phrases(user_message.lower())
+        
         # Check category-specific escalation triggers
-        escalation_reason = self._check_category_triggers(category, user_message)
+        escalation_reason = self._check_category_triggers(category, found)
         if escalation_reason:
-            urgency = self._determine_urgency(user_message)
+            urgency = self._determine_urgency(found)
             return EscalationInfo(
                 required=True,
                 reason=escalation_reason,
-                contact=self.escalation_contacts.get(category, "it-support@techcorp.com"),
+                contact=contact,
                 urgency=urgency
             )
         
         # Check for keyword-based escalation
-        keyword_urgency = self._check_keyword_escalation(user_message)
+        keyword_urgency = self._check_keyword_escalation(found)
         if keyword_urgency:
             return EscalationInfo(
                 required=True,
                 reason=f"Request contains keywords indicating {keyword_urgency} priority issue",
-                contact=self.escalation_contacts.get(category, "it-support@techcorp.com"),
+                contact=contact,
                 urgency=keyword_urgency
             )
         
         # Check low confidence classification
-        if confidence < 0.3:
+        if confidence < LOW_CONFIDENCE_ESCALATION_THRESHOLD:
             return EscalationInfo(
                 required=True,
                 reason=f"Low classification confidence ({confidence:.2f}) - human review recommended",
-                contact="it-support@techcorp.com",
+                contact=self.default_contact,
                 urgency="low"
             )
         
@@ -113,108 +252,56 @@ class EscalationManager:
             urgency=None
         )
     
-    def _check_category_triggers(self, category: str, user_message: str) -> str:
+    def _find_phrases(self, user_message_lower: str) -> Set[str]:
+        """Return every known escalation phrase that occurs in the lowercased message."""
+        if self._phrase_automaton is not None:
+            return {phrase for _, phrase in self._phrase_automaton.iter(user_message_lower)}
+        
+        found = set()
+        for phrase in set(self._phrase_pattern.findall(user_message_lower)):
+            found |= self._implied_phrases[phrase]
+        return found
+    
+    def _check_category_triggers(self, category: str, found: Set[str]) -> str:
         """Check for category-specific escalation triggers."""
         
-        category_obj = self.knowledge_base.categories.get(category)
-        if not category_obj:
+        trigger_index = self._category_trigger_index.get(category)
+        if not trigger_index:
             return None
         
-        user_message_lower = user_message.lower()
+        # Evaluate each phrase group once, then take the first trigger it applies to
+        fired = {
+            group for group, phrases in TRIGGER_PHRASE_GROUPS.items()
+            if not found.isdisjoint(phrases)
+        }
         
-        # Check each escalation trigger for this category
-        for trigger in category_obj.escalation_triggers:
-            trigger_lower = trigger.lower()
-            
-            # Check for specific trigger phrases
-            if any(phrase in user_message_lower for phrase in [
-                "multiple failed", "failed multiple", "several attempts",
-                "tried many times", "keep failing", "still not working"
-            ]) and "reset" in trigger_lower:
-                return f"Multiple failed attempts detected: {trigger}"
-            
-            # Check for security-related triggers
-            if any(phrase in user_message_lower for phrase in [
-                "security concern", "account compromised", "suspicious activity",
-                "unauthorized access", "strange behavior"
-            ]) and "security" in trigger_lower:
-                return f"Security concern identified: {trigger}"
-            
-            # Check for approval-related triggers
-            if any(phrase in user_message_lower for phrase in [
-                "new software", "install software", "need approval",
-                "not approved", "custom software"
-            ]) and "approval" in trigger_lower:
-                return f"Approval required: {trigger}"
-            
-            # Check for infrastructure issues
-            if any(phrase in user_message_lower for phrase in [
-                "network down", "wifi down", "internet down", "can't connect",
-                "no one can", "everyone having", "whole office"
-            ]) and "infrastructure" in trigger_lower:
-                return f"Infrastructure issue detected: {trigger}"
+        for group, trigger in trigger_index:
+            if group in fired:
+                return self.trigger_reasons[group].format(trigger)
         
         return None
     
-    def _check_keyword_escalation(self, user_message: str) -> str:
+    def _check_keyword_escalation(self, found: Set[str]) -> str:
         """Check for escalation based on keywords in the message."""
         
-        user_message_lower = user_message.lower()
-        highest_urgency = None
-        urgency_levels = {"low": 1, "medium": 2, "high": 3, "critical": 4}
-        max_level = 0
-        
-        for keyword, urgency in self.escalation_keywords.items():
-            if keyword in user_message_lower:
-                level = urgency_levels.get(urgency, 0)
-                if level > max_level:
-                    max_level = level
-                    highest_urgency = urgency
+        for keyword, urgency in self._keywords_by_urgency:
+            if keyword in found:
+                return urgency
         
-        return highest_urgency
+        return None
     
-    def _determine_urgency(self, user_message: str) -> str:
+    def _determine_urgency(self, found: Set[str]) -> str:
         """Determine urgency level based on message content."""
         
-        user_message_lower = user_message.lower()
-        
-        # Critical urgency indicators
-        critical_indicators = [
-            "emergency", "critical", "urgent", "asap", "immediately",
-            "production down", "server down", "system down",
-            "data loss", "corrupted", "virus", "hacked", "malware"
-        ]
-        
-        # High urgency indicators  
-        high_indicators = [
-            "important meeting", "deadline", "presentation",
-            "can't work", "blocking", "stopped working",
-            "multiple people", "department", "team affected"
-        ]
-        
-        # Medium urgency indicators
-        medium_indicators = [
-            "soon", "today", "this morning", "this afternoon",
-            "affecting work", "slowing down"
-        ]
-        
-        for indicator in critical_indicators:
-            if indicator in user_message_lower:
-                return "critical"
-        
-        for indicator in high_indicators:
-            if indicator in user_message_lower:
-                return "high"
-        
-        for indicator in medium_indicators:
-            if indicator in user_message_lower:
-                return "medium"
+        for urgency, indicators in self.urgency_indicators.items():
+            if not found.isdisjoint(indicators):
+                return urgency
         
         return "low"
     
     def get_escalation_contact(self, category: str) -> str:
         """Get the appropriate escalation contact for a category."""
-        return self.escalation_contacts.get(category, "it-support@techcorp.com")
+        return self.escalation_contacts.get(category, self.default_contact)
     
     def should_auto_escalate(self, category: str) -> bool:
         """Check if a category requires automatic escalation."""
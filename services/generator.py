@@ -1,16 +1,207 @@
-from typing import List
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import AsyncIterator, ClassVar, Dict, List, Optional, Tuple
+
+import httpx
 from openai import AsyncOpenAI
 
+from config import get_settings
 from models.request import HelpDeskRequest
 from models.response import ClassificationResult, KnowledgeItem, EscalationInfo
 
 
+logger = logging.getLogger(__name__)
+
+
 class ResponseGenerator:
     """Generates contextual responses using OpenAI based on classified requests and retrieved knowledge."""
     
-    def __init__(self, api_key: str, model: str = "gpt-4"):
-        self.client = AsyncOpenAI(api_key=api_key)
+    # One client (and connection pool) per API key and event loop, shared by every generator
+    # without its own client; pooled connections are bound to the loop that opened them
+    _clients: ClassVar[Dict[Tuple[str, asyncio.AbstractEventLoop], AsyncOpenAI]] = {}
+    
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        client: Optional[AsyncOpenAI] = None,
+        cache_size: int = 512,
+        max_concurrency: int = 20
+    ):
+        # A shared client lets several services reuse one connection pool
+        self.api_key = api_key
+        self._client = client
         self.model = model
+        
+        # Bounds concurrent OpenAI calls so batches stay within the account's rate limits
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # LRU of generated responses keyed by a digest of the full prompt (0 disables)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, str]" = OrderedDict()
+        
+        # System prompt defining the AI assistant's role and behavior
+        self._system_prompt = """You are an expert IT Help Desk assistant for TechCorp Inc. Your role is to provide helpful, accurate, and professional responses to employee IT requests.
+
+GUIDELINES:
+- Be friendly, professional, and empathetic
+- Provide clear, step-by-step instructions when applicable
+- Reference company policies and procedures when relevant
+- Always include next steps or follow-up actions
+- If escalation is required, explain why and provide contact information
+- Use the retrieved knowledge to give accurate, company-specific guidance
+- Keep responses concise but comprehensive
+- Show understanding of the user's urgency and business impact
+
+RESPONSE STRUCTURE:
+1. Acknowledge the issue with empathy
+2. Provide the solution or next steps
+3. Include relevant company-specific information
+4. Mention escalation if required
+5. Offer additional help or resources
+
+Remember: You represent TechCorp's IT support team, so maintain a professional and helpful tone."""
+        
+        # Specific instructions for each category
+        self._category_instructions = {
+            "password_reset": """
+- Guide them to the self-service password reset portal
+- Mention password policy requirements
+- Explain account lockout procedures
+- Provide IT contact for persistent issues
+""",
+            "software_installation": """
+- Check if software is approved for installation
+- Provide installation steps with administrator privileges
+- Include troubleshooting for common installation issues
+- Mention manager approval requirements for new software
+""",
+            "hardware_failure": """
+- Acknowledge urgency of hardware issues
+- Advise on data backup if possible
+- Explain hardware replacement timeline
+- Mention temporary equipment availability
+- Always escalate to hardware support team
+""",
+            "network_connectivity": """
+- Provide basic network troubleshooting steps
+- Check for widespread network issues
+- Include VPN troubleshooting if relevant
+- Escalate if multiple users affected
+""",
+            "email_configuration": """
+- Provide email server settings (IMAP/SMTP)
+- Check for mailbox storage issues
+- Include synchronization troubleshooting
+- Mention email admin for server-side issues
+""",
+            "security_incident": """
+- Take security concerns seriously
+- Advise immediate reporting to security team
+- Instruct not to attempt fixes themselves
+- Emphasize evidence preservation
+- Always escalate to security team
+""",
+            "policy_question": """
+- Reference relevant company IT policies
+- Provide clear policy explanations
+- Include approval processes if applicable
+- Direct to appropriate contacts for exceptions
+"""
+        }
+        
+        # Response length budget per category; routine answers need far fewer tokens
+        self.default_max_tokens = 800
+        self._max_tokens_by_category = {
+            "password_reset": 300,
+            "software_installation": 600,
+            "hardware_failure": 400,
+            "network_connectivity": 600,
+            "email_configuration": 500,
+            "security_incident": 400,
+            "policy_question": 500
+        }
+        
+        # Complete fallback responses per category, with the escalation block filled in per request
+        fallback_responses = {
+            "password_reset": "For password issues, please visit https://password.techcorp.com to reset your password using your company email address. If you continue to have issues, please contact IT support at it-support@techcorp.com.",
+            
+            "software_installation": "For software installation help, please ensure you're running the installer as an administrator. If you need new software installed, please check with your manager for approval and contact IT support for assistance.",
+            
+            "hardware_failure": "Hardware issues require immediate attention. Please contact our hardware support team immediately and avoid using the affected device to prevent data loss. We'll arrange replacement equipment as needed.",
+            
+            "network_connectivity": "For network connectivity issues, please try restarting your network adapter and check with colleagues if they're experiencing similar issues. If the problem persists, please contact network support.",
+            
+            "email_configuration": "For email configuration issues, please check your internet connection and verify your email settings. If you continue to have problems, please contact our email support team.",
+            
+            "security_incident": "Security incidents require immediate attention. Please do not attempt to fix the issue yourself. Contact our security team immediately at security@techcorp.com and preserve any evidence.",
+            
+            "policy_question": "For IT policy questions, please refer to our company IT policies or contact IT support for clarification. We're here to help ensure you're following the correct procedures."
+        }
+        greeting = "Hello! I understand you're experiencing a {category_label} issue. "
+        closing = "{escalation}\n\nIs there anything else I can help you with today?"
+        self._fallback_templates = {
+            category: greeting.format(category_label=category.replace('_', ' ')) + text + closing
+            for category, text in fallback_responses.items()
+        }
+        self._default_fallback_template = (
+            greeting
+            + "I'll help you with your IT request. Please contact our IT support team for immediate assistance."
+            + closing
+        )
+        
+        # Escalation block keyed by (has contact, has reason)
+        escalation_intro = "\n\nThis issue requires escalation to our specialized team. "
+        self._escalation_fragments = {
+            (True, True): escalation_intro + "Please contact {contact} for immediate assistance. Reason: {reason}",
+            (True, False): escalation_intro + "Please contact {contact} for immediate assistance.",
+            (False, True): escalation_intro + " Reason: {reason}",
+            (False, False): escalation_intro
+        }
+    
+    @property
+    def client(self) -> AsyncOpenAI:
+        """The caller's client, or the shared client for this API key on the running event loop."""
+        if self._client is not None:
+            return self._client
+        return self._shared_client(self.api_key)
+    
+    @classmethod
+    def _shared_client(cls, api_key: str) -> AsyncOpenAI:
+        """Return the shared client for an API key on the running loop, creating it if needed."""
+        key = (api_key, asyncio.get_running_loop())
+        client = cls._clients.get(key)
+        if client is None:
+            # Clients of finished loops cannot be reused (or awaited to close), so drop them
+            for stale_key in [k for k in cls._clients if k[1].is_closed()]:
+                del cls._clients[stale_key]
+            
+            # Same pool limits and timeouts as the application's shared client
+            settings = get_settings()
+            client = AsyncOpenAI(
+                api_key=api_key,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.openai_max_connections,
+                        max_keepalive_connections=settings.openai_max_keepalive_connections
+                    ),
+                    timeout=httpx.Timeout(settings.openai_timeout, connect=settings.openai_connect_timeout)
+                )
+            )
+            cls._clients[key] = client
+        return client
+    
+    @classmethod
+    async def close_shared_clients(cls):
+        """Close the shared clients created on the running loop and forget those of finished loops."""
+        loop = asyncio.get_running_loop()
+        for key in list(cls._clients):
+            if key[1] is loop:
+                await cls._clients.pop(key).close()
+            elif key[1].is_closed():
+                del cls._clients[key]
     
     async def generate_response(
         self,
@@ -39,54 +230,184 @@ class ResponseGenerator:
             knowledge_items, 
             escalation_info
         )
+        system_prompt = self._get_system_prompt()
+        max_tokens = self._max_tokens_by_category.get(classification.category, self.default_max_tokens)
+        
+        # Identical prompts (same request, knowledge and escalation) reuse the earlier answer
+        cache_key = self._cache_key(system_prompt, prompt, max_tokens)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
         
         try:
             # Generate response using OpenAI
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._get_system_prompt()
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3,  # Balanced creativity and consistency
-                max_tokens=800    # Reasonable response length
-            )
+            async with self._semaphore:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": system_prompt
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.3,  # Balanced creativity and consistency
+                    max_tokens=max_tokens
+                )
             
-            return response.choices[0].message.content.strip()
+            response_text = response.choices[0].message.content.strip()
+            self._cache_set(cache_key, response_text)
+            return response_text
             
-        except Exception as e:
-            print(f"Error generating response: {e}")
+        except Exception:
+            logger.exception("Error generating response")
             # Fallback response
             return self._generate_fallback_response(request, classification, escalation_info)
     
+    async def stream_response(
+        self,
+        request: HelpDeskRequest,
+        classification: ClassificationResult,
+        knowledge_items: List[KnowledgeItem],
+        escalation_info: EscalationInfo
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response text as OpenAI generates it.
+        
+        Args:
+            request: The original user request
+            classification: Classification result with category and confidence
+            knowledge_items: Relevant knowledge retrieved from the knowledge base
+            escalation_info: Escalation decision and details
+            
+        Yields:
+            Chunks of response text; the fallback response if nothing could be streamed
+        """
+        
+        prompt = self._create_response_prompt(
+            request,
+            classification,
+            knowledge_items,
+            escalation_info
+        )
+        system_prompt = self._get_system_prompt()
+        max_tokens = self._max_tokens_by_category.get(classification.category, self.default_max_tokens)
+        
+        cache_key = self._cache_key(system_prompt, prompt, max_tokens)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        
+        # The upstream stream is drained into a queue by a separate task, so the concurrency
+        # permit is released when OpenAI finishes rather than when the HTTP client has read
+        # everything; each content delta carries at least one token, bounding the queue
+        queue: "asyncio.Queue[object]" = asyncio.Queue(maxsize=max_tokens + 2)
+        producer = asyncio.create_task(self._drain_stream(queue, system_prompt, prompt, max_tokens))
+        
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                parts.append(item)
+                yield item
+                
+        except Exception:
+            logger.exception("Error streaming response")
+            # Text already sent cannot be replaced, so only fall back before the first chunk
+            if not parts:
+                yield self._generate_fallback_response(request, classification, escalation_info)
+            return
+        finally:
+            # Stops the upstream call if the consumer went away early
+            producer.cancel()
+        
+        self._cache_set(cache_key, "".join(parts).strip())
+    
+    async def _drain_stream(self, queue: asyncio.Queue, system_prompt: str, prompt: str, max_tokens: int):
+        """Read an OpenAI completion stream into the queue, ending with None (or the raised exception)."""
+        try:
+            async with self._semaphore:
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": system_prompt
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.3,
+                    max_tokens=max_tokens,
+                    stream=True
+                )
+                
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        await queue.put(content)
+                        
+        except Exception as e:
+            await queue.put(e)
+            return
+        
+        await queue.put(None)
+    
+    async def generate_batch(
+        self,
+        items: List[Tuple[HelpDeskRequest, ClassificationResult, List[KnowledgeItem], EscalationInfo]]
+    ) -> List[str]:
+        """
+        Generate responses for several requests concurrently.
+        
+        Args:
+            items: (request, classification, knowledge_items, escalation_info) for each request
+            
+        Returns:
+            Generated response text for each item, in the same order
+        """
+        return await asyncio.gather(*(self.generate_response(*item) for item in items))
+    
+    def _cache_key(self, system_prompt: str, prompt: str, max_tokens: int) -> bytes:
+        """Digest of everything sent to the model for one response."""
+        digest = hashlib.sha1(f"{self.model}\0{max_tokens}\0".encode("utf-8"))
+        digest.update(system_prompt.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8"))
+        return digest.digest()
+    
+    def _cache_get(self, key: bytes) -> Optional[str]:
+        """Return a cached response and mark it as recently used."""
+        response_text = self._cache.get(key)
+        if response_text is not None:
+            self._cache.move_to_end(key)
+        return response_text
+    
+    def _cache_set(self, key: bytes, response_text: str):
+        """Store a generated response, evicting the least recently used one."""
+        if self.cache_size <= 0 or not response_text:
+            return
+        self._cache[key] = response_text
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
     def _get_system_prompt(self) -> str:
         """System prompt defining the AI assistant's role and behavior."""
-        return """You are an expert IT Help Desk assistant for TechCorp Inc. Your role is to provide helpful, accurate, and professional responses to employee IT requests.
-
-GUIDELINES:
-- Be friendly, professional, and empathetic
-- Provide clear, step-by-step instructions when applicable
-- Reference company policies and procedures when relevant
-- Always include next steps or follow-up actions
-- If escalation is required, explain why and provide contact information
-- Use the retrieved knowledge to give accurate, company-specific guidance
-- Keep responses concise but comprehensive
-- Show understanding of the user's urgency and business impact
-
-RESPONSE STRUCTURE:
-1. Acknowledge the issue with empathy
-2. Provide the solution or next steps
-3. Include relevant company-specific information
-4. Mention escalation if required
-5. Offer additional help or resources
-
-Remember: You represent TechCorp's IT support team, so maintain a professional and helpful tone."""
+        return self._system_prompt
     
     def _create_response_prompt(
         self,
@@ -97,7 +418,8 @@ Remember: You represent TechCorp's IT support team, so maintain a professional a
     ) -> str:
         """Create a detailed prompt for response generation."""
         
-        prompt = f"""
+        parts = [
+            f"""
 USER REQUEST: "{request.message}"
 
 CLASSIFICATION:
@@ -107,35 +429,36 @@ CLASSIFICATION:
 
 RELEVANT KNOWLEDGE:
 """
+        ]
         
         # Add retrieved knowledge items
         if knowledge_items:
             for i, item in enumerate(knowledge_items, 1):
-                prompt += f"\n{i}. Source: {item.source} (Relevance: {item.relevance_score:.2f})\n"
-                prompt += f"   Content: {item.content}\n"
+                parts.append(f"\n{i}. Source: {item.source} (Relevance: {item.relevance_score:.2f})\n")
+                parts.append(f"   Content: {item.content}\n")
         else:
-            prompt += "\nNo specific knowledge retrieved - provide general guidance based on category.\n"
+            parts.append("\nNo specific knowledge retrieved - provide general guidance based on category.\n")
         
         # Add escalation information
-        prompt += f"\nESCALATION INFO:\n"
-        prompt += f"- Required: {escalation_info.required}\n"
+        parts.append("\nESCALATION INFO:\n")
+        parts.append(f"- Required: {escalation_info.required}\n")
         if escalation_info.required:
-            prompt += f"- Reason: {escalation_info.reason}\n"
-            prompt += f"- Contact: {escalation_info.contact}\n"
-            prompt += f"- Urgency: {escalation_info.urgency}\n"
+            parts.append(f"- Reason: {escalation_info.reason}\n")
+            parts.append(f"- Contact: {escalation_info.contact}\n")
+            parts.append(f"- Urgency: {escalation_info.urgency}\n")
         
         # Add request context
         if request.priority and request.priority != "normal":
-            prompt += f"\nREQUEST PRIORITY: {request.priority.upper()}\n"
+            parts.append(f"\nREQUEST PRIORITY: {request.priority.upper()}\n")
         
         if request.user_id:
-            prompt += f"USER: {request.user_id}\n"
+            parts.append(f"USER: {request.user_id}\n")
         
         # Specific instructions based on category
         category_instructions = self._get_category_specific_instructions(classification.category)
-        prompt += f"\nCATEGORY-SPECIFIC GUIDANCE:\n{category_instructions}\n"
+        parts.append(f"\nCATEGORY-SPECIFIC GUIDANCE:\n{category_instructions}\n")
         
-        prompt += """
+        parts.append("""
 GENERATE A HELPFUL RESPONSE:
 Create a professional, empathetic response that addresses the user's issue. Include:
 1. Acknowledgment of their problem
@@ -143,61 +466,16 @@ Create a professional, empathetic response that addresses the user's issue. Incl
 3. Company-specific information from the knowledge base
 4. Escalation information if required
 5. Next steps or follow-up actions
-"""
+""")
         
-        return prompt
+        return "".join(parts)
     
     def _get_category_specific_instructions(self, category: str) -> str:
         """Get specific instructions for each category."""
-        
-        instructions = {
-            "password_reset": """
-- Guide them to the self-service password reset portal
-- Mention password policy requirements
-- Explain account lockout procedures
-- Provide IT contact for persistent issues
-""",
-            "software_installation": """
-- Check if software is approved for installation
-- Provide installation steps with administrator privileges
-- Include troubleshooting for common installation issues
-- Mention manager approval requirements for new software
-""",
-            "hardware_failure": """
-- Acknowledge urgency of hardware issues
-- Advise on data backup if possible
-- Explain hardware replacement timeline
-- Mention temporary equipment availability
-- Always escalate to hardware support team
-""",
-            "network_connectivity": """
-- Provide basic network troubleshooting steps
-- Check for widespread network issues
-- Include VPN troubleshooting if relevant
-- Escalate if multiple users affected
-""",
-            "email_configuration": """
-- Provide email server settings (IMAP/SMTP)
-- Check for mailbox storage issues
-- Include synchronization troubleshooting
-- Mention email admin for server-side issues
-""",
-            "security_incident": """
-- Take security concerns seriously
-- Advise immediate reporting to security team
-- Instruct not to attempt fixes themselves
-- Emphasize evidence preservation
-- Always escalate to security team
-""",
-            "policy_question": """
-- Reference relevant company IT policies
-- Provide clear policy explanations
-- Include approval processes if applicable
-- Direct to appropriate contacts for exceptions
-"""
-        }
-        
-        return instructions.get(category, "Provide general IT support guidance appropriate for the request.")
+        return self._category_instructions.get(
+            category,
+            "Provide general IT support guidance appropriate for the request."
+        )
     
     def _generate_fallback_response(
         self,
@@ -207,40 +485,16 @@ Create a professional, empathetic response that addresses the user's issue. Incl
     ) -> str:
         """Generate a fallback response when OpenAI fails."""
         
-        response = f"Hello! I understand you're experiencing a {classification.category.replace('_', ' ')} issue. "
-        
-        # Category-specific fallback responses
-        fallback_responses = {
-            "password_reset": "For password issues, please visit https://password.techcorp.com to reset your password using your company email address. If you continue to have issues, please contact IT support at it-support@techcorp.com.",
-            
-            "software_installation": "For software installation help, please ensure you're running the installer as an administrator. If you need new software installed, please check with your manager for approval and contact IT support for assistance.",
-            
-            "hardware_failure": "Hardware issues require immediate attention. Please contact our hardware support team immediately and avoid using the affected device to prevent data loss. We'll arrange replacement equipment as needed.",
-            
-            "network_connectivity": "For network connectivity issues, please try restarting your network adapter and check with colleagues if they're experiencing similar issues. If the problem persists, please contact network support.",
-            
-            "email_configuration": "For email configuration issues, please check your internet connection and verify your email settings. If you continue to have problems, please contact our email support team.",
-            
-            "security_incident": "Security incidents require immediate attention. Please do not attempt to fix the issue yourself. Contact our security team immediately at security@techcorp.com and preserve any evidence.",
-            
-            "policy_question": "For IT policy questions, please refer to our company IT policies or contact IT support for clarification. We're here to help ensure you're following the correct procedures."
-        }
-        
-        category_response = fallback_responses.get(
-            classification.category, 
-            "I'll help you with your IT request. Please contact our IT support team for immediate assistance."
-        )
-        
-        response += category_response
-        
-        # Add escalation information
+        escalation = ""
         if escalation_info.required:
-            response += f"\n\nThis issue requires escalation to our specialized team. "
-            if escalation_info.contact:
-                response += f"Please contact {escalation_info.contact} for immediate assistance."
-            if escalation_info.reason:
-                response += f" Reason: {escalation_info.reason}"
-        
-        response += "\n\nIs there anything else I can help you with today?"
+            fragment = self._escalation_fragments[(bool(escalation_info.contact), bool(escalation_info.reason))]
+            escalation = fragment.format_map({
+                "contact": escalation_info.contact,
+                "reason": escalation_info.reason
+            })
         
-        return response
\ No newline at end of file
+        template = self._fallback_templates.get(classification.category, self._default_fallback_template)
+        return template.format_map({
+            "category_label": classification.category.replace('_', ' '),
+            "escalation": escalation
+        })
\ No newline at end of file
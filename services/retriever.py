@@ -1,35 +1,238 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+from typing import List, Dict, Any, FrozenSet, Optional, Tuple
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+try:
+    import torch
+    import intel_extension_for_pytorch as ipex
+except ImportError:
+    torch = None
+    ipex = None
 
 from models.response import KnowledgeItem
 from models.knowledge import KnowledgeDocument
-from utils import KnowledgeBase
+from utils import KnowledgeBase, MicroBatcher
+
+
+logger = logging.getLogger(__name__)
+
+
+# Brute-force similarity scans larger than this are split across worker threads
+PARALLEL_SCAN_MIN_ROWS = 50000
+
+# The result cache is consulted only when the corpus has at least this many chunks per cache
+# slot; below that, comparing against the cached queries costs as much as searching the chunks
+RESULT_CACHE_MIN_CHUNK_RATIO = 8
+
+# Markdown header lines (leading whitespace allowed) and runs of blank lines inside a section
+_HEADER_RE = re.compile(r"^[^\S\n]*#[^\n]*", re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r"\n(?:[^\S\n]*\n)+")
+
+
+def _reduce_best_per_source(
+    similarities: np.ndarray,
+    boost: np.ndarray,
+    source_ids: np.ndarray,
+    num_sources: int,
+    threshold: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Boost, threshold and reduce chunk similarities to the best chunk per source.
+    
+    Compiled with Numba when it is installed; an empty boost means no boost.
+    
+    Returns:
+        Tuple of (best score per source, best chunk index per source or -1)
+    """
+    num_rows = similarities.shape[0]
+    has_boost = boost.shape[0] > 0
+    scores = np.empty(num_rows, dtype=np.float32)
+    
+    for i in prange(num_rows):
+        score = similarities[i] + boost[i] if has_boost else similarities[i]
+        scores[i] = score if similarities[i] >= threshold else -np.inf
+    
+    best_scores = np.full(num_sources, -np.inf, dtype=np.float32)
+    best_chunks = np.full(num_sources, -1, dtype=np.int64)
+    for i in range(num_rows):
+        score = scores[i]
+        # ">=" lets the higher index win ties, as in the candidate order
+        if score > -np.inf and score >= best_scores[source_ids[i]]:
+            best_scores[source_ids[i]] = score
+            best_chunks[source_ids[i]] = i
+    return best_scores, best_chunks
+
+
+if njit is not None:
+    _reduce_best_per_source = njit(cache=True, parallel=True)(_reduce_best_per_source)
+
+_NO_BOOST = np.empty(0, dtype=np.float32)
+
+
+@dataclass
+class Chunk:
+    """A searchable piece of the knowledge base."""
+    
+    __slots__ = ("content", "source", "type", "category", "metadata")
+    
+    content: str
+    source: str
+    type: str
+    category: Optional[str]
+    metadata: Dict[str, Any]
 
 
 class KnowledgeRetriever:
-    """Retrieves relevant knowledge using semantic search with embeddings (No FAISS dependency)."""
+    """Retrieves relevant knowledge using semantic search with embeddings (FAISS optional)."""
     
-    def __init__(self, knowledge_base: KnowledgeBase, embedding_model: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        knowledge_base: KnowledgeBase,
+        embedding_model: str = "all-MiniLM-L6-v2",
+        encoder: Optional[SentenceTransformer] = None,
+        cache_dir: Optional[str] = None,
+        ann_min_chunks: int = 10000,
+        concept_categories: Optional[List[str]] = None,
+        concept_max_words: int = 15,
+        concept_index_size: int = 5,
+        query_cache_size: int = 2048,
+        quantize_embeddings: bool = False,
+        pca_dims: int = 0,
+        result_cache_size: int = 0,
+        result_cache_threshold: float = 0.95,
+        query_batch_size: int = 32,
+        query_batch_window: float = 0.005,
+        use_bf16: bool = False
+    ):
         self.knowledge_base = knowledge_base
         self.embedding_model_name = embedding_model
-        self.encoder = None
-        self.knowledge_chunks = []  # Store text chunks with metadata
+        self.encoder = encoder  # May be preloaded by the caller
+        self.use_bf16 = use_bf16 and ipex is not None  # BF16 inference needs Intel Extension for PyTorch
+        self.cache_dir = Path(cache_dir) if cache_dir else None  # On-disk embedding cache
+        self.knowledge_chunks: List[Chunk] = []  # Store text chunks with metadata
+        # Parallel per-chunk arrays (same order as knowledge_chunks) for the hot search paths
+        self.contents: List[str] = []
+        self.contents_lower: List[str] = []
+        self.sources: np.ndarray = np.empty(0, dtype=object)
+        self.category_ids: np.ndarray = np.empty(0, dtype=np.int32)  # -1 for chunks without a category
+        self.source_ids: np.ndarray = np.empty(0, dtype=np.intp)  # One id per distinct source
+        self.num_sources = 0
+        self.category_index: Dict[str, int] = {}
+        self._by_category: Dict[str, np.ndarray] = {}
         self.embeddings = None
+        # Encoder output for the last prepared chunk set, reused when a reload yields identical content
+        self._content_signature: Optional[bytes] = None
+        self._chunk_embeddings: Optional[np.ndarray] = None
+        self.ann_min_chunks = ann_min_chunks  # Below this size brute-force search is exact and fast
+        self.index = None  # FAISS index, only built for large knowledge bases
+        self._hnsw_index = None  # hnswlib index, used instead when FAISS is not installed
+        self.quantize_embeddings = quantize_embeddings  # Search int8 vectors instead of float32
+        self._embeddings_i8: Optional[np.ndarray] = None  # Per-row scaled int8 copy for brute-force search
+        self._embedding_scales: Optional[np.ndarray] = None
+        self.pca_dims = pca_dims  # Search in a PCA-reduced space when > 0
+        self._pca_mean: Optional[np.ndarray] = None
+        self._pca_components: Optional[np.ndarray] = None  # (dim, pca_dims) projection
+        self._scan_block_rows: Optional[int] = None  # Rows per L2-sized block of the brute-force scan
+        self._scan_executor: Optional[ThreadPoolExecutor] = None
+        self.concept_categories = concept_categories or []  # Categories answered from precomputed results
+        self.concept_max_words = concept_max_words
+        self.concept_index_size = concept_index_size
+        self._concept_index: Dict[str, List[KnowledgeItem]] = {}
+        # Keyword automata for search_by_keywords, keyed by the lowercased keyword set
+        self._keyword_automata: "OrderedDict[FrozenSet[str], Any]" = OrderedDict()
+        # Per-instance LRU of query embeddings keyed by the normalized message
+        self.query_cache_size = query_cache_size
+        self._query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Concurrent query encodings are coalesced into one encoder call off the event loop;
+        # a query arriving alone is encoded at once rather than waiting out the window
+        self._query_batcher: Optional[MicroBatcher] = None
+        if query_batch_size > 1:
+            self._query_batcher = MicroBatcher(self._encode_query_batch, query_batch_size, query_batch_window)
+        # Semantic result cache: near-identical queries (cosine >= threshold) with the same
+        # category and parameters reuse earlier results (items and scores), kept in a ring
+        # buffer per key; off by default and skipped on corpora too small for it to pay off
+        self.result_cache_size = result_cache_size
+        self.result_cache_threshold = result_cache_threshold
+        self._result_cache: Dict[Tuple[Optional[str], int, float], Dict[str, Any]] = {}
         
     async def initialize(self):
         """Initialize the embedding model and build the search index."""
-        print(f"🔧 Loading embedding model: {self.embedding_model_name}")
-        self.encoder = SentenceTransformer(self.embedding_model_name)
+        # Model loading and encoding run in a worker thread so the event loop stays responsive
+        if self.encoder is None:
+            self.encoder = await asyncio.to_thread(self.load_encoder, self.embedding_model_name, self.use_bf16)
+        
+        self._result_cache.clear()
         
-        print("📝 Preparing knowledge chunks...")
+        logger.info("📝 Preparing knowledge chunks...")
         self._prepare_knowledge_chunks()
         
-        print("🔮 Generating embeddings...")
-        self._generate_embeddings()
+        logger.info("🔮 Generating embeddings...")
+        await asyncio.to_thread(self._generate_embeddings)
+        await asyncio.to_thread(self._reduce_dimensions)
+        await asyncio.to_thread(self._build_index)
+        self._quantize_embeddings()
+        await asyncio.to_thread(self._build_concept_index)
+        
+        logger.info("✅ Knowledge retriever initialized with %d chunks", len(self.knowledge_chunks))
+    
+    @staticmethod
+    def load_encoder(embedding_model: str, use_bf16: bool = False) -> SentenceTransformer:
+        """Load the sentence transformer; safe to call from a worker thread."""
+        logger.info("🔧 Loading embedding model: %s", embedding_model)
+        encoder = SentenceTransformer(embedding_model)
+        
+        if use_bf16 and ipex is not None:
+            # Intel Extension for PyTorch: BF16 kernels on CPUs with AMX/AVX-512 BF16
+            encoder.eval()
+            transformer = encoder._first_module()
+            transformer.auto_model = ipex.optimize(transformer.auto_model, dtype=torch.bfloat16)
+            logger.info("⚡ Optimized embedding model for BF16 inference")
         
-        print(f"✅ Knowledge retriever initialized with {len(self.knowledge_chunks)} chunks")
+        return encoder
+    
+    def _encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        """Encode texts to normalized float32 embeddings, under BF16 autocast when enabled."""
+        kwargs.setdefault("convert_to_numpy", True)
+        kwargs.setdefault("normalize_embeddings", True)
+        
+        if self.use_bf16:
+            with torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16):
+                embeddings = self.encoder.encode(texts, **kwargs)
+        else:
+            embeddings = self.encoder.encode(texts, **kwargs)
+        
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
     
     def _prepare_knowledge_chunks(self):
         """Break down knowledge base into searchable chunks."""
@@ -37,66 +240,66 @@ class KnowledgeRetriever:
         
         # Process categories
         for cat_name, category in self.knowledge_base.categories.items():
-            chunk = {
-                "content": f"Category: {cat_name} - {category.description}. "
-                          f"Resolution time: {category.typical_resolution_time}. "
-                          f"Escalation triggers: {', '.join(category.escalation_triggers)}",
-                "source": f"categories.json:{cat_name}",
-                "type": "category",
-                "category": cat_name,
-                "metadata": {
+            chunk = Chunk(
+                content=f"Category: {cat_name} - {category.description}. "
+                       f"Resolution time: {category.typical_resolution_time}. "
+                       f"Escalation triggers: {', '.join(category.escalation_triggers)}",
+                source=sys.intern(f"categories.json:{cat_name}"),
+                type="category",
+                category=cat_name,
+                metadata={
                     "resolution_time": category.typical_resolution_time,
                     "escalation_triggers": category.escalation_triggers
                 }
-            }
+            )
             self.knowledge_chunks.append(chunk)
         
         # Process installation guides
         for software, guide in self.knowledge_base.installation_guides.items():
             # Main guide chunk
-            steps_text = ". ".join(guide.steps)
-            chunk = {
-                "content": f"Installing {software}: {guide.title}. Steps: {steps_text}",
-                "source": f"installation_guides.json:{software}",
-                "type": "installation_guide",
-                "category": "software_installation",
-                "metadata": {
+            source = sys.intern(f"installation_guides.json:{software}")
+            issues_source = sys.intern(f"{source}:issues")
+            chunk = Chunk(
+                content=f"Installing {software}: {guide.title}. Steps: {guide.steps_text}",
+                source=source,
+                type="installation_guide",
+                category="software_installation",
+                metadata={
                     "software": software,
                     "support_contact": guide.support_contact
                 }
-            }
+            )
             self.knowledge_chunks.append(chunk)
             
             # Common issues chunks
             for issue in guide.common_issues:
-                issue_chunk = {
-                    "content": f"{software} issue: {issue.issue}. Solution: {issue.solution}",
-                    "source": f"installation_guides.json:{software}:issues",
-                    "type": "common_issue",
-                    "category": "software_installation",
-                    "metadata": {
+                issue_chunk = Chunk(
+                    content=f"{software} issue: {issue.issue}. Solution: {issue.solution}",
+                    source=issues_source,
+                    type="common_issue",
+                    category="software_installation",
+                    metadata={
                         "software": software,
                         "issue_type": "installation",
                         "support_contact": guide.support_contact
                     }
-                }
+                )
                 self.knowledge_chunks.append(issue_chunk)
         
         # Process troubleshooting steps
         for issue_type, steps in self.knowledge_base.troubleshooting_steps.items():
-            steps_text = ". ".join(steps.steps)
-            chunk = {
-                "content": f"Troubleshooting {issue_type} ({steps.category}): {steps_text}. "
-                          f"Escalate when: {steps.escalation_trigger}",
-                "source": f"troubleshooting_database.json:{issue_type}",
-                "type": "troubleshooting",
-                "category": self._map_troubleshooting_to_category(issue_type),
-                "metadata": {
+            chunk = Chunk(
+                content=f"Troubleshooting {issue_type} ({steps.category}): {steps.steps_text}. "
+                       f"Escalate when: {steps.escalation_trigger}",
+                source=sys.intern(f"troubleshooting_database.json:{issue_type}"),
+                type="troubleshooting",
+                category=self._map_troubleshooting_to_category(issue_type),
+                metadata={
                     "issue_type": issue_type,
                     "escalation_trigger": steps.escalation_trigger,
                     "escalation_contact": steps.escalation_contact
                 }
-            }
+            )
             self.knowledge_chunks.append(chunk)
         
         # Process policy documents (split into sections)
@@ -114,48 +317,54 @@ class KnowledgeRetriever:
                 "knowledge_base.md"
             )
             self.knowledge_chunks.extend(kb_sections)
+        
+        self._build_chunk_arrays()
+    
+    def _build_chunk_arrays(self):
+        """Lay out chunk fields as parallel arrays plus a category -> chunk indices bucket index."""
+        self.contents = [chunk.content for chunk in self.knowledge_chunks]
+        self.contents_lower = [content.lower() for content in self.contents]
+        self.sources = np.array([chunk.source for chunk in self.knowledge_chunks], dtype=object)
+        unique_sources, self.source_ids = np.unique(self.sources.astype(str), return_inverse=True)
+        self.num_sources = len(unique_sources)
+        
+        self.category_index = {}
+        category_ids = []
+        for chunk in self.knowledge_chunks:
+            category = chunk.category
+            if category is None:
+                category_ids.append(-1)
+            else:
+                category_ids.append(self.category_index.setdefault(category, len(self.category_index)))
+        self.category_ids = np.array(category_ids, dtype=np.int32)
+        
+        self._by_category = {
+            category: np.flatnonzero(self.category_ids == category_id)
+            for category, category_id in self.category_index.items()
+        }
     
-    def _split_markdown_sections(self, content: str, source: str) -> List[Dict[str, Any]]:
+    def _split_markdown_sections(self, content: str, source: str) -> List[Chunk]:
         """Split markdown content into logical sections."""
         sections = []
-        lines = content.split('\n')
-        current_section = []
-        current_header = ""
-        
-        for line in lines:
-            if line.strip().startswith('#'):
-                # Save previous section
-                if current_section and current_header:
-                    section_content = '\n'.join(current_section).strip()
-                    if section_content:
-                        category = self._infer_category_from_header(current_header)
-                        sections.append({
-                            "content": f"{current_header}: {section_content}",
-                            "source": f"{source}:{current_header.replace('#', '').strip()}",
-                            "type": "policy" if "policies" in source else "knowledge",
-                            "category": category,
-                            "metadata": {"section": current_header.strip()}
-                        })
-                
-                # Start new section
-                current_header = line.strip()
-                current_section = []
-            else:
-                if line.strip():  # Skip empty lines
-                    current_section.append(line)
-        
-        # Add final section
-        if current_section and current_header:
-            section_content = '\n'.join(current_section).strip()
-            if section_content:
-                category = self._infer_category_from_header(current_header)
-                sections.append({
-                    "content": f"{current_header}: {section_content}",
-                    "source": f"{source}:{current_header.replace('#', '').strip()}",
-                    "type": "policy" if "policies" in source else "knowledge",
-                    "category": category,
-                    "metadata": {"section": current_header.strip()}
-                })
+        section_type = "policy" if "policies" in source else "knowledge"
+        headers = list(_HEADER_RE.finditer(content))
+        
+        # Each section is the text between its header and the next; text before the first header is dropped
+        for i, header_match in enumerate(headers):
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(content)
+            section_content = _BLANK_LINES_RE.sub("\n", content[header_match.end():end]).strip()
+            if not section_content:
+                continue
+            
+            current_header = header_match.group().strip()
+            category = self._infer_category_from_header(current_header)
+            sections.append(Chunk(
+                content=f"{current_header}: {section_content}",
+                source=sys.intern(f"{source}:{current_header.replace('#', '').strip()}"),
+                type=section_type,
+                category=category,
+                metadata={"section": current_header}
+            ))
         
         return sections
     
@@ -192,23 +401,465 @@ class KnowledgeRetriever:
     def _generate_embeddings(self):
         """Generate embeddings for all knowledge chunks."""
         if not self.knowledge_chunks:
-            print("⚠️  No knowledge chunks to embed")
+            logger.warning("⚠️  No knowledge chunks to embed")
             return
         
         # Extract text content
-        texts = [chunk["content"] for chunk in self.knowledge_chunks]
+        texts = self.contents
+        hashes = np.array(
+            [hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest() for text in texts],
+            dtype="S16"
+        )
+        
+        # Reinitializing this process with unchanged chunks reuses the last matrix outright
+        signature = hashlib.blake2b(hashes.tobytes(), digest_size=16).digest()
+        if signature == self._content_signature and self._chunk_embeddings is not None:
+            self.embeddings = self._chunk_embeddings
+            logger.info("♻️  Knowledge content unchanged, reusing %d embeddings", self.embeddings.shape[0])
+            return
+        
+        # Reuse embeddings from a previous run: all of them when no chunk changed, otherwise
+        # only the rows whose content hash is still present
+        cached_hashes, cached_embeddings = self._load_embedding_cache()
+        if cached_hashes is not None and np.array_equal(cached_hashes, hashes):
+            self.embeddings = cached_embeddings
+            logger.info("📦 Loaded %d cached embeddings from %s", self.embeddings.shape[0], self.cache_dir)
+            self._content_signature, self._chunk_embeddings = signature, self.embeddings
+            return
+        
+        cached_rows = {}
+        if cached_hashes is not None:
+            cached_rows = {digest: row for row, digest in enumerate(cached_hashes)}
+        missing = [i for i, digest in enumerate(hashes) if digest not in cached_rows]
         
         # Generate embeddings using sentence transformers
-        print(f"🔮 Generating embeddings for {len(texts)} chunks...")
-        self.embeddings = self.encoder.encode(
-            texts,
-            batch_size=32,
-            show_progress_bar=True,
-            convert_to_numpy=True,
-            normalize_embeddings=True  # Normalize for cosine similarity
+        logger.info("🔮 Generating embeddings for %d of %d chunks...", len(missing), len(texts))
+        if missing:
+            new_embeddings = self._encode(
+                [texts[i] for i in missing],
+                batch_size=32,
+                show_progress_bar=True
+            )
+        
+        # Contiguous float32 so similarity search is one BLAS call without copies
+        dimension = new_embeddings.shape[1] if missing else cached_embeddings.shape[1]
+        embeddings = np.empty((len(texts), dimension), dtype=np.float32)
+        if missing:
+            embeddings[missing] = new_embeddings
+        for i, digest in enumerate(hashes):
+            row = cached_rows.get(digest)
+            if row is not None:
+                embeddings[i] = cached_embeddings[row]
+        self.embeddings = embeddings
+        
+        logger.info("📊 Generated %d embeddings of dimension %d", *self.embeddings.shape)
+        
+        self._save_embedding_cache(hashes, self.embeddings)
+        self._content_signature, self._chunk_embeddings = signature, self.embeddings
+    
+    def _embedding_cache_paths(self) -> Optional[Tuple[Path, Path]]:
+        """Paths of the cached embedding matrix and its per-chunk content hashes for this model."""
+        if self.cache_dir is None:
+            return None
+        
+        model_key = hashlib.sha256(self.embedding_model_name.encode("utf-8")).hexdigest()[:16]
+        return (
+            self.cache_dir / f"embeddings_{model_key}.npy",
+            self.cache_dir / f"embeddings_{model_key}.hashes.npy"
         )
+    
+    def _load_embedding_cache(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Load cached (hashes, memory-mapped embeddings), or (None, None) if unavailable."""
+        paths = self._embedding_cache_paths()
+        if paths is None or not all(path.exists() for path in paths):
+            return None, None
+        
+        embeddings_file, hashes_file = paths
+        try:
+            hashes = np.load(hashes_file)
+            embeddings = np.load(embeddings_file, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️  Ignoring unreadable embedding cache: %s", e)
+            return None, None
         
-        print(f"📊 Generated {self.embeddings.shape[0]} embeddings of dimension {self.embeddings.shape[1]}")
+        if len(hashes) != len(embeddings):
+            return None, None
+        return hashes, embeddings
+    
+    def _save_embedding_cache(self, hashes: np.ndarray, embeddings: np.ndarray):
+        """Write the embeddings and their content hashes, replacing any previous cache atomically."""
+        paths = self._embedding_cache_paths()
+        if paths is None:
+            return
+        
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for path, array in zip(paths, (embeddings, hashes)):
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+    
+    def _reduce_dimensions(self):
+        """Project the embeddings onto their top principal components (renormalized)."""
+        self._pca_mean = None
+        self._pca_components = None
+        if self.pca_dims <= 0 or self.embeddings is None:
+            return
+        
+        num_rows, dimension = self.embeddings.shape
+        dims = min(self.pca_dims, num_rows)
+        if dims >= dimension:
+            return
+        
+        # PCA via SVD of the centered matrix; rows of vt are the principal axes
+        mean = self.embeddings.mean(axis=0)
+        _, _, vt = np.linalg.svd(self.embeddings - mean, full_matrices=False)
+        self._pca_mean = mean.astype(np.float32)
+        self._pca_components = np.ascontiguousarray(vt[:dims].T, dtype=np.float32)
+        
+        self.embeddings = self._project(self.embeddings)
+        logger.info("📉 Reduced embeddings from %d to %d dimensions with PCA", dimension, dims)
+    
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        """Map encoder vectors into the search space (PCA projection when enabled)."""
+        if self._pca_components is None:
+            return vectors
+        
+        projected = (vectors - self._pca_mean) @ self._pca_components
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(projected / norms, dtype=np.float32)
+    
+    def _build_index(self):
+        """Build an approximate nearest-neighbour index (FAISS, else hnswlib) when the KB is large."""
+        self.index = None
+        self._hnsw_index = None
+        if self.embeddings is None or len(self.embeddings) < self.ann_min_chunks:
+            return
+        if faiss is None:
+            if hnswlib is not None:
+                self._build_hnsw_index()
+            return
+        
+        vectors = np.ascontiguousarray(self.embeddings, dtype=np.float32)
+        dimension = vectors.shape[1]
+        
+        if len(vectors) > 100000 and dimension % 8 == 0:
+            # Very large KBs: inverted lists with product-quantized vectors
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, 4096, dimension // 8, 8, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+            index.nprobe = 32
+        elif self.quantize_embeddings:
+            # 8-bit scalar quantization: a quarter of the memory, recall close to float32
+            nlist = max(1, min(1024, int(np.sqrt(len(vectors)))))
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, dimension, nlist, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(vectors)
+            index.nprobe = min(nlist, 16)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 200
+            index.hnsw.efSearch = 64
+        
+        index.add(vectors)
+        self.index = index
+        logger.info("🗂️  Built FAISS %s over %d chunks", type(index).__name__, index.ntotal)
+    
+    def _build_hnsw_index(self):
+        """Build an hnswlib HNSW graph; inner product equals cosine on the normalized embeddings."""
+        vectors = np.ascontiguousarray(self.embeddings, dtype=np.float32)
+        
+        index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        index.init_index(max_elements=len(vectors), ef_construction=200, M=16)
+        index.add_items(vectors, np.arange(len(vectors)))
+        index.set_ef(64)
+        
+        self._hnsw_index = index
+        logger.info("🗂️  Built hnswlib HNSW index over %d chunks", len(vectors))
+    
+    def _quantize_embeddings(self):
+        """Keep an int8 copy of the embeddings (per-row scale) for the brute-force scan."""
+        self._embeddings_i8 = None
+        self._embedding_scales = None
+        has_ann_index = self.index is not None or self._hnsw_index is not None
+        if not self.quantize_embeddings or has_ann_index or self.embeddings is None:
+            return
+        
+        self._embeddings_i8, self._embedding_scales = self._quantize_rows(self.embeddings)
+        logger.info("🗜️  Quantized %d embeddings to int8", len(self._embeddings_i8))
+    
+    @staticmethod
+    def _quantize_rows(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Symmetric int8 quantization with one scale per row."""
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    
+    def _build_concept_index(self, similarity_threshold: float = 0.5):
+        """Precompute the best knowledge items for each configured category from its description."""
+        self._concept_index = {}
+        if self.embeddings is None or not self.concept_categories:
+            return
+        
+        for cat_name in self.concept_categories:
+            category = self.knowledge_base.categories.get(cat_name)
+            if category is None:
+                continue
+            
+            category_embedding = self._project(self._encode([f"{cat_name}: {category.description}"]))
+            self._concept_index[cat_name] = self._rank_candidates(
+                category_embedding, cat_name, self.concept_index_size, similarity_threshold
+            )
+        
+        logger.info("🧭 Precomputed knowledge for %d categories", len(self._concept_index))
+    
+    def _search(
+        self,
+        query_embedding: np.ndarray,
+        k: int,
+        boost: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the k best chunk indices and their raw similarities, best first.
+        
+        Args:
+            query_embedding: Normalized query embedding of shape (1, dim)
+            k: Number of candidates to return
+            boost: Optional per-chunk score added to the similarity before ranking
+            
+        Returns:
+            Tuple of (chunk indices, similarities), ordered by boosted score
+        """
+        if self.index is not None:
+            # The ANN index ranks by similarity only; the boost re-orders what it returns
+            k = min(k, self.index.ntotal)
+            similarities, indices = self.index.search(np.ascontiguousarray(query_embedding, dtype=np.float32), k)
+            found = indices[0] >= 0
+            candidates = indices[0][found].astype(np.intp)
+            # Quantized indexes (IVF-SQ, IVF-PQ) return reconstructed scores; thresholds and
+            # ranking use exact similarities against the float32 embeddings instead
+            similarities = self.embeddings[candidates] @ query_embedding[0]
+        elif self._hnsw_index is not None:
+            # hnswlib reports inner-product distance as 1 - similarity; ef must be at least k
+            k = min(k, self._hnsw_index.get_current_count())
+            self._hnsw_index.set_ef(max(64, k))
+            labels, distances = self._hnsw_index.knn_query(query_embedding, k=k)
+            candidates = labels[0].astype(np.intp)
+            similarities = (1.0 - distances[0]).astype(np.float32)
+        else:
+            k = min(k, len(self.embeddings))
+            
+            if self._embeddings_i8 is not None:
+                # Approximate int8 scan (int32 accumulation), then exact float32 scores for the best candidates
+                query_i8, query_scale = self._quantize_rows(query_embedding[:1])
+                approximate = np.einsum("ij,j->i", self._embeddings_i8, query_i8[0], dtype=np.int32)
+                approximate = approximate * self._embedding_scales * query_scale[0]
+                if boost is not None:
+                    approximate += boost
+                candidates = np.argpartition(-approximate, k - 1)[:k]
+                similarities = self.embeddings[candidates] @ query_embedding[0]
+            else:
+                # Embeddings and query are unit-normalized, so cosine similarity is a single matrix-vector product
+                all_similarities = self._similarities(query_embedding[0])
+                scores = all_similarities if boost is None else all_similarities + boost
+                
+                # O(N) selection of the k best, then sort only those
+                candidates = np.argpartition(-scores, k - 1)[:k]
+                similarities = all_similarities[candidates]
+        
+        scores = similarities if boost is None else similarities + boost[candidates]
+        
+        # Best first; ties keep the previous full-sort order (higher index first)
+        order = np.lexsort((-candidates, -scores))
+        return candidates[order], similarities[order]
+    
+    def _similarities(self, query_vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every chunk to the query, computed in L2-sized row blocks."""
+        num_rows, dimension = self.embeddings.shape
+        if self._scan_block_rows is None:
+            self._scan_block_rows = self._l2_block_rows(dimension)
+        
+        block_rows = self._scan_block_rows
+        if num_rows <= block_rows:
+            return self.embeddings @ query_vector
+        
+        similarities = np.empty(num_rows, dtype=np.float32)
+        
+        def scan_block(start: int):
+            np.matmul(self.embeddings[start:start + block_rows], query_vector, out=similarities[start:start + block_rows])
+        
+        starts = range(0, num_rows, block_rows)
+        if num_rows >= PARALLEL_SCAN_MIN_ROWS and (os.cpu_count() or 1) > 1:
+            # NumPy releases the GIL inside matmul, so blocks run in parallel
+            if self._scan_executor is None:
+                self._scan_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="retriever-scan")
+            list(self._scan_executor.map(scan_block, starts))
+        else:
+            for start in starts:
+                scan_block(start)
+        return similarities
+    
+    @staticmethod
+    def _l2_block_rows(dimension: int) -> int:
+        """Rows of float32 embeddings that fill about half of the L2 cache."""
+        try:
+            l2_bytes = os.sysconf("SC_LEVEL2_CACHE_SIZE")
+        except (AttributeError, ValueError, OSError):
+            l2_bytes = 0
+        if l2_bytes <= 0:
+            l2_bytes = 1 << 20  # Assume 1 MiB when the size cannot be probed
+        return max(256, (l2_bytes // 2) // (dimension * 4) // 64 * 64)
+    
+    def _category_boost(self, category: Optional[str]) -> Optional[np.ndarray]:
+        """Per-chunk relevance boost for chunks in the predicted category (None when nothing is boosted)."""
+        members = self._by_category.get(category) if category else None
+        if members is None:
+            return None
+        
+        boost = np.zeros(len(self.contents), dtype=np.float32)
+        boost[members] = 0.1
+        return boost
+    
+    async def close(self):
+        """Stop the query-encoding batcher and the scan worker threads."""
+        if self._query_batcher is not None:
+            await self._query_batcher.close()
+        if self._scan_executor is not None:
+            self._scan_executor.shutdown(wait=False)
+            self._scan_executor = None
+    
+    async def _embed_query(self, normalized_query: str) -> np.ndarray:
+        """Embedding of a normalized query, from the LRU or the (batched) encoder."""
+        embedding = self._query_embeddings.get(normalized_query)
+        if embedding is not None:
+            self._query_embeddings.move_to_end(normalized_query)
+            return embedding
+        
+        if self._query_batcher is not None:
+            embedding = await self._query_batcher.submit(normalized_query)
+        else:
+            embedding = await asyncio.to_thread(self._encode_query, normalized_query)
+        
+        if self.query_cache_size > 0:
+            self._query_embeddings[normalized_query] = embedding
+            if len(self._query_embeddings) > self.query_cache_size:
+                self._query_embeddings.popitem(last=False)
+        return embedding
+    
+    async def _encode_query_batch(self, normalized_queries: List[str]) -> List[np.ndarray]:
+        """Encode several queries in one forward pass, in a worker thread."""
+        embeddings = await asyncio.to_thread(self._encode, normalized_queries, batch_size=32)
+        embeddings.setflags(write=False)
+        return [embeddings[i:i + 1] for i in range(len(normalized_queries))]
+    
+    def _encode_query(self, normalized_query: str) -> np.ndarray:
+        """Embed a normalized query; the result is shared by the cache, so it is read-only."""
+        embedding = self._encode([normalized_query])
+        embedding.setflags(write=False)
+        return embedding
+    
+    def _rank_candidates(
+        self,
+        query_embedding: np.ndarray,
+        category: Optional[str],
+        top_k: int,
+        similarity_threshold: float
+    ) -> List[KnowledgeItem]:
+        """Turn nearest chunks into de-duplicated, category-boosted knowledge items."""
+        # Category filtering (prefer same category, but don't exclude others): the boost
+        # takes part in top-k selection, while the threshold applies to raw similarity
+        boost = self._category_boost(category)
+        
+        if self.index is None and self._hnsw_index is None and self._embeddings_i8 is None:
+            indices, scores = self._best_per_source(query_embedding, boost, top_k, similarity_threshold)
+        else:
+            indices, scores = self._best_in_window(query_embedding, boost, top_k, similarity_threshold)
+        
+        return [
+            KnowledgeItem(
+                content=self.contents[idx],
+                source=self.sources[idx],
+                relevance_score=float(score)
+            )
+            for idx, score in zip(indices, scores)
+        ]
+    
+    def _best_per_source(
+        self,
+        query_embedding: np.ndarray,
+        boost: Optional[np.ndarray],
+        top_k: int,
+        similarity_threshold: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact scan: reduce all chunk scores to the best chunk per source, then take the top_k sources."""
+        similarities = self._similarities(query_embedding[0])
+        
+        if njit is not None:
+            # Single native pass: boost, threshold and per-source best
+            best_scores, best_chunks = _reduce_best_per_source(
+                similarities,
+                _NO_BOOST if boost is None else boost,
+                self.source_ids,
+                self.num_sources,
+                similarity_threshold
+            )
+        else:
+            scores = similarities if boost is None else similarities + boost
+            scores = np.where(similarities >= similarity_threshold, scores, -np.inf)
+            
+            best_scores = np.full(self.num_sources, -np.inf, dtype=scores.dtype)
+            np.maximum.at(best_scores, self.source_ids, scores)
+            
+            # Winning chunk per source; ties go to the higher index, as in the candidate order
+            winners = np.flatnonzero((scores == best_scores[self.source_ids]) & (scores > -np.inf))
+            best_chunks = np.full(self.num_sources, -1, dtype=np.intp)
+            np.maximum.at(best_chunks, self.source_ids[winners], winners)
+        
+        sources = np.flatnonzero(best_chunks >= 0)
+        if len(sources) > top_k:
+            # O(S) cut at the k-th best score, keeping ties so the final order decides them
+            kth_score = -np.partition(-best_scores[sources], top_k - 1)[top_k - 1]
+            sources = sources[best_scores[sources] >= kth_score]
+        
+        indices, scores = best_chunks[sources], best_scores[sources]
+        order = np.lexsort((-indices, -scores))[:top_k]
+        return indices[order], scores[order]
+    
+    def _best_in_window(
+        self,
+        query_embedding: np.ndarray,
+        boost: Optional[np.ndarray],
+        top_k: int,
+        similarity_threshold: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Candidate window from the ANN index or int8 scan, de-duplicated by source."""
+        # Over-fetch so source de-duplication still leaves top_k results; widen only if it does not
+        num_candidates = top_k * 4
+        
+        while True:
+            # Candidate chunks ordered by boosted score
+            candidate_indices, candidate_similarities = self._search(query_embedding, num_candidates, boost)
+            candidate_scores = candidate_similarities
+            if boost is not None:
+                candidate_scores = candidate_similarities + boost[candidate_indices]
+            
+            passing = candidate_similarities >= similarity_threshold
+            indices, scores = candidate_indices[passing], candidate_scores[passing]
+            
+            # First occurrence of each source is its best chunk, since candidates are in final order
+            _, first = np.unique(self.source_ids[indices], return_index=True)
+            first = np.sort(first)[:top_k]
+            indices, scores = indices[first], scores[first]
+            
+            # Later candidates score below the last one, so none of them can pass the threshold either
+            exhausted = len(candidate_indices) < num_candidates or len(candidate_indices) >= len(self.knowledge_chunks)
+            if len(indices) >= top_k or exhausted or candidate_scores[-1] < similarity_threshold:
+                return indices, scores
+            num_candidates *= 2
     
     async def retrieve_knowledge(
         self, 
@@ -230,99 +881,140 @@ class KnowledgeRetriever:
             List of relevant KnowledgeItem objects
         """
         if self.embeddings is None or not self.encoder:
-            print("⚠️  Knowledge retriever not initialized")
+            logger.warning("⚠️  Knowledge retriever not initialized")
             return []
         
+        # Short queries in common categories are answered from the precomputed concept index
+        concept_items = self._concept_index.get(category)
+        if concept_items is not None and top_k <= self.concept_index_size and len(query.split()) < self.concept_max_words:
+            return list(concept_items[:top_k])
+        
         try:
-            # Generate query embedding
-            query_embedding = self.encoder.encode(
-                [query], 
-                convert_to_numpy=True,
-                normalize_embeddings=True
-            )
-            
-            # Calculate cosine similarity with all knowledge chunks
-            similarities = cosine_similarity(query_embedding, self.embeddings)[0]
-            
-            # Get indices sorted by similarity (descending)
-            sorted_indices = np.argsort(similarities)[::-1]
-            
-            # Filter and rank results
-            results = []
-            seen_sources = set()
+            # Generate query embedding (repeated questions hit the cache)
+            query_embedding = self._project(await self._embed_query(query.strip().lower()))
             
-            for idx in sorted_indices:
-                similarity_score = similarities[idx]
-                
-                if similarity_score < similarity_threshold:
-                    continue
-                
-                chunk = self.knowledge_chunks[idx]
-                source = chunk["source"]
-                
-                # Avoid duplicate sources
-                if source in seen_sources:
-                    continue
-                seen_sources.add(source)
-                
-                # Category filtering (prefer same category, but don't exclude others)
-                relevance_boost = 0.0
-                if category and chunk.get("category") == category:
-                    relevance_boost = 0.1
-                
-                # Create knowledge item
-                knowledge_item = KnowledgeItem(
-                    content=chunk["content"],
-                    source=source,
-                    relevance_score=float(similarity_score + relevance_boost)
-                )
-                
-                results.append(knowledge_item)
-                
-                if len(results) >= top_k:
-                    break
+            use_result_cache = 0 < self.result_cache_size * RESULT_CACHE_MIN_CHUNK_RATIO <= len(self.knowledge_chunks)
+            cache_key = (category, top_k, similarity_threshold)
+            if use_result_cache:
+                results = self._result_cache_get(cache_key, query_embedding[0])
+                if results is not None:
+                    return results
             
-            # Sort by relevance score (descending)
-            results.sort(key=lambda x: x.relevance_score, reverse=True)
+            results = self._rank_candidates(query_embedding, category, top_k, similarity_threshold)
+            if use_result_cache:
+                self._result_cache_set(cache_key, query_embedding[0], results)
             
-            print(f"🔍 Retrieved {len(results)} knowledge items for category '{category}'")
+            logger.debug("🔍 Retrieved %d knowledge items for category %r", len(results), category)
             return results
             
-        except Exception as e:
-            print(f"❌ Error in knowledge retrieval: {e}")
+        except Exception:
+            logger.exception("❌ Error in knowledge retrieval")
             return []
     
+    def _result_cache_get(
+        self,
+        key: Tuple[Optional[str], int, float],
+        query_vector: np.ndarray
+    ) -> Optional[List[KnowledgeItem]]:
+        """Return cached results of the most similar earlier query, if it is similar enough."""
+        entry = self._result_cache.get(key)
+        if entry is None:
+            return None
+        
+        similarities = entry["vectors"][:len(entry["results"])] @ query_vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.result_cache_threshold:
+            return None
+        return list(entry["results"][best])
+    
+    def _result_cache_set(
+        self,
+        key: Tuple[Optional[str], int, float],
+        query_vector: np.ndarray,
+        results: List[KnowledgeItem]
+    ):
+        """Store results in the key's ring buffer, overwriting the oldest slot when full."""
+        if self.result_cache_size <= 0:
+            return
+        
+        entry = self._result_cache.get(key)
+        if entry is None:
+            entry = {
+                "vectors": np.zeros((self.result_cache_size, query_vector.shape[0]), dtype=np.float32),
+                "results": [],
+                "next_slot": 0
+            }
+            self._result_cache[key] = entry
+        
+        slot = entry["next_slot"]
+        entry["vectors"][slot] = query_vector
+        if slot < len(entry["results"]):
+            entry["results"][slot] = list(results)
+        else:
+            entry["results"].append(list(results))
+        entry["next_slot"] = (slot + 1) % self.result_cache_size
+    
     def get_category_specific_knowledge(self, category: str) -> List[KnowledgeItem]:
         """Get all knowledge items specific to a category."""
         items = []
         
-        for chunk in self.knowledge_chunks:
-            if chunk.get("category") == category:
-                item = KnowledgeItem(
-                    content=chunk["content"],
-                    source=chunk["source"],
-                    relevance_score=1.0  # Max relevance for exact category match
-                )
-                items.append(item)
+        for idx in self._by_category.get(category, ()):
+            item = KnowledgeItem(
+                content=self.contents[idx],
+                source=self.sources[idx],
+                relevance_score=1.0  # Max relevance for exact category match
+            )
+            items.append(item)
         
         return items
     
     def search_by_keywords(self, keywords: List[str], top_k: int = 5) -> List[KnowledgeItem]:
         """Simple keyword-based search as fallback."""
         results = []
+        keywords_lower = [keyword.lower() for keyword in keywords]
+        automaton = self._keyword_automaton(keywords_lower)
         
-        for chunk in self.knowledge_chunks:
-            content_lower = chunk["content"].lower()
-            score = sum(1 for keyword in keywords if keyword.lower() in content_lower)
+        for idx, content_lower in enumerate(self.contents_lower):
+            if automaton is not None:
+                # One pass over the content finds every keyword it contains
+                found = {keyword for _, keyword in automaton.iter(content_lower)}
+                score = sum(1 for keyword in keywords_lower if keyword in found or not keyword)
+            else:
+                score = sum(1 for keyword in keywords_lower if keyword in content_lower)
             
             if score > 0:
                 item = KnowledgeItem(
-                    content=chunk["content"],
-                    source=chunk["source"],
+                    content=self.contents[idx],
+                    source=self.sources[idx],
                     relevance_score=float(score / len(keywords))
                 )
                 results.append(item)
         
         # Sort by score and return top results
         results.sort(key=lambda x: x.relevance_score, reverse=True)
-        return results[:top_k]
\ No newline at end of file
+        return results[:top_k]
+    
+    def _keyword_automaton(self, keywords_lower: List[str]) -> Optional[Any]:
+        """Aho-Corasick automaton over the keywords, cached per keyword set (None without pyahocorasick)."""
+        if ahocorasick is None:
+            return None
+        
+        # No non-empty keywords: the substring check scores these ("" matches every chunk)
+        key = frozenset(keyword for keyword in keywords_lower if keyword)
+        if not key:
+            return None
+        
+        automaton = self._keyword_automata.get(key)
+        if automaton is not None:
+            self._keyword_automata.move_to_end(key)
+            return automaton
+        
+        automaton = ahocorasick.Automaton()
+        for keyword in key:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        
+        self._keyword_automata[key] = automaton
+        if len(self._keyword_automata) > 128:
+            self._keyword_automata.popitem(last=False)
+        return automaton
\ No newline at end of file
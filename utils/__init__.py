@@ -1,3 +1,4 @@
 from .document_loader import DocumentLoader, KnowledgeBase
+from .batching import MicroBatcher
 
-__all__ = ["DocumentLoader", "KnowledgeBase"]
\ No newline at end of file
+__all__ = ["DocumentLoader", "KnowledgeBase", "MicroBatcher"]
\ No newline at end of file
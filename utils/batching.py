@@ -0,0 +1,117 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set
+
+
+class MicroBatcher:
+    """Coalesces concurrent calls into batches processed by a single handler call."""
+    
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 8,
+        max_wait: float = 0.02
+    ):
+        """
+        Args:
+            handler: Coroutine receiving a list of items and returning one result per item
+            max_batch_size: Maximum number of items handed to the handler at once
+            max_wait: Seconds to wait for more items when others are already queued
+        """
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+    
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result from the next batch."""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+            
+        future = loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+    
+    async def close(self):
+        """Stop the background worker, fail items still queued and wait for in-flight batches."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        # Queued items will never be dispatched; fail them so their callers do not hang
+        while self._queue is not None and not self._queue.empty():
+            self._fail([self._queue.get_nowait()])
+            
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+    
+    async def _run(self):
+        """Drain the queue into batches bounded by size and wait window."""
+        loop = asyncio.get_running_loop()
+        
+        batch: List[Any] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                
+                # A lone item is dispatched at once; waiting only pays off when others are arriving
+                if self._queue.empty():
+                    self._dispatch_later(loop, batch)
+                    batch = []
+                    continue
+                
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                        
+                self._dispatch_later(loop, batch)
+                batch = []
+        except asyncio.CancelledError:
+            # Items collected but not yet dispatched would otherwise never resolve
+            self._fail(batch)
+            raise
+    
+    def _fail(self, batch: List[Any]):
+        """Fail items that will never reach the handler."""
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(RuntimeError("MicroBatcher closed before the item was processed"))
+    
+    def _dispatch_later(self, loop: asyncio.AbstractEventLoop, batch: List[Any]):
+        """Dispatch without blocking collection of the next batch."""
+        task = loop.create_task(self._dispatch(batch))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def _dispatch(self, batch: List[Any]):
+        """Run the handler for one batch and resolve the waiting futures."""
+        items = [item for item, _ in batch]
+        
+        try:
+            results = await self.handler(items)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+            
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
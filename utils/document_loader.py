@@ -1,8 +1,10 @@
-import json
+import asyncio
 import os
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+import orjson
+
 from models.knowledge import (
     Category, 
     InstallationGuide, 
@@ -103,11 +105,40 @@ class DocumentLoader:
         # Load general knowledge base
         self._load_knowledge_base()
         
+        self._report_counts()
+        return self.knowledge_base
+    
+    async def load_all_async(self) -> KnowledgeBase:
+        """Load all knowledge base files, reading and parsing them concurrently in worker threads."""
+        print(f"Loading knowledge base from {self.data_dir}")
+        
+        # Each JSON loader fills its own dict; the markdown loaders share the document
+        # list, so they run in one thread to keep policies ahead of the knowledge base
+        await asyncio.gather(
+            asyncio.to_thread(self._load_categories),
+            asyncio.to_thread(self._load_installation_guides),
+            asyncio.to_thread(self._load_troubleshooting_database),
+            asyncio.to_thread(self._load_markdown_documents)
+        )
+        
+        self._report_counts()
+        return self.knowledge_base
+    
+    def _load_markdown_documents(self):
+        """Load the policy and general knowledge documents, in that order."""
+        self._load_policies()
+        self._load_knowledge_base()
+    
+    def _report_counts(self):
+        """Print a summary of what was loaded."""
         print(f"Loaded {len(self.knowledge_base.categories)} categories")
         print(f"Loaded {len(self.knowledge_base.installation_guides)} installation guides")
         print(f"Loaded {len(self.knowledge_base.troubleshooting_steps)} troubleshooting procedures")
-        
-        return self.knowledge_base
+    
+    @staticmethod
+    def _read_json(file_path: Path) -> Dict[str, Any]:
+        """Parse a JSON file with orjson straight from its bytes."""
+        return orjson.loads(file_path.read_bytes())
     
     def _load_categories(self):
         """Load categories.json"""
@@ -116,8 +147,7 @@ class DocumentLoader:
             print(f"Warning: {file_path} not found")
             return
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = self._read_json(file_path)
         
         for cat_name, cat_data in data.get("categories", {}).items():
             category = Category(
@@ -135,8 +165,7 @@ class DocumentLoader:
             print(f"Warning: {file_path} not found")
             return
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = self._read_json(file_path)
         
         for software, guide_data in data.get("software_guides", {}).items():
             # Parse common issues
@@ -163,8 +192,7 @@ class DocumentLoader:
             print(f"Warning: {file_path} not found")
             return
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = self._read_json(file_path)
         
         for issue_type, step_data in data.get("troubleshooting_steps", {}).items():
             steps = TroubleshootingStep(
@@ -183,8 +211,7 @@ class DocumentLoader:
             print(f"Warning: {file_path} not found")
             return
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = file_path.read_text(encoding='utf-8')
         
         self.knowledge_base.policies = content
         
@@ -203,8 +230,7 @@ class DocumentLoader:
             print(f"Warning: {file_path} not found")
             return
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = file_path.read_text(encoding='utf-8')
         
         self.knowledge_base.general_knowledge = content
         